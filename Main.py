@@ -1,493 +1,759 @@
+import time
+
+STARTED = time.perf_counter()
+
 import arcade
-import random
 import math
-import os
+import threading
+import numpy as np
+import pyglet
+from arcade.gl import BufferDescription
+import simulation
+from audio import Mixer
+from levels import load_level
+from profiler import FrameProfiler, StartupTimer, make_profiler
+from replay import Replay, ZOOM, MENU
+from saves import QUICK_SLOTS, SaveGame, load_save, slot_path
+from scores import ScoreStore
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT, TILE_SIZE, BULLET_CAPACITY, TICK,
+                        ENDLESS_LEVEL, VERSUS, Simulation, Barrel, Boss, cell_center, to_cell)
 
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
 SCREEN_TITLE = "Tancheke"
-SAVE_FILE = "record.txt"
 
-TILE_SIZE = 40
-BULLET_SPEED = 7
-SHOOT_COOLDOWN = 1.3
-MAX_LEVELS = 3
 ANGLE_OFFSET = -90
-
-def load_high_score():
-    if os.path.exists(SAVE_FILE):
-        try:
-            with open(SAVE_FILE, "r", encoding="utf-8") as file:
-                content = file.read().strip()
-                return int(content) if content else 0
-        except (ValueError, IOError):
-            return 0
-    return 0
-
-def save_high_score(new_score):
-    current_high = load_high_score()
-    if new_score > current_high:
-        with open(SAVE_FILE, "w", encoding="utf-8") as file:
-            file.write(str(new_score))
-
-def reset_high_score():
-    if os.path.exists(SAVE_FILE):
-        os.remove(SAVE_FILE)
-
-class FloatingText(arcade.Sprite):
-    def __init__(self, x, y, text):
-        super().__init__()
-        self.texture = arcade.Texture.create_empty(f"empty_{random.random()}", (1, 1))
-        self.center_x = x
-        self.center_y = y
-        self.text = text
+PARTICLE_CAPACITY = 2048
+MAX_STEPS_PER_FRAME = 5
+CAMERA_SMOOTHING = 0.1
+MENU_LEADERS = 5
+PLAYER_COLORS = ((255, 255, 255), (120, 200, 255), (255, 160, 120), (160, 255, 140))
+
+TEXTURE_FILES = (
+    "PNG/Me.png",
+    "PNG/Enemy.png",
+    "PNG/Boss.png",
+    "PNG/Wall.png",
+    "PNG/Box.png",
+    "PNG/Box1.png",
+    "PNG/Box2.png",
+)
+SHOOT_SOUND = "BAM.mp3"
+HP_SOUND = "HP.mp3"
+SOUND_FILES = (SHOOT_SOUND, HP_SOUND)
+LEVEL_NAMES = tuple(f"level{i}" for i in range(1, simulation.MAX_LEVELS + 1)) + ("secret", "endless")
+
+INPUT_KEYS = {
+    arcade.key.UP: simulation.UP,
+    arcade.key.DOWN: simulation.DOWN,
+    arcade.key.LEFT: simulation.LEFT,
+    arcade.key.RIGHT: simulation.RIGHT,
+    arcade.key.SPACE: simulation.FIRE,
+    arcade.key.R: simulation.RESTART,
+    arcade.key.B: simulation.SECRET,
+}
+SLOT_KEYS = {getattr(arcade.key, f"KEY_{slot}"): slot for slot in range(1, QUICK_SLOTS + 1)}
+
+EXPLOSIONS = {
+    "barrel": (arcade.color.ORANGE, 20),
+    "player_hit": (arcade.color.RED_ORANGE, 30),
+    "enemy": (arcade.color.YELLOW, 25),
+    "boss_hit": (arcade.color.WHITE, 5),
+    "boss": (arcade.color.GOLD, 50),
+}
+
+POINT_VERTEX_SHADER = """
+#version 330
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+in vec2 in_vert;
+in vec2 in_pos;
+in float in_size;
+in vec4 in_color;
+out vec4 v_color;
+out vec2 v_offset;
+void main() {
+    gl_Position = window.projection * window.view * vec4(in_pos + in_vert * in_size, 0.0, 1.0);
+    v_color = in_color;
+    v_offset = in_vert;
+}
+"""
+
+POINT_FRAGMENT_SHADER = """
+#version 330
+uniform bool circular;
+in vec4 v_color;
+in vec2 v_offset;
+out vec4 f_color;
+void main() {
+    if (circular && dot(v_offset, v_offset) > 0.25) {
+        discard;
+    }
+    f_color = v_color;
+}
+"""
+
+class AssetRegistry:
+    def __init__(self):
+        self.textures = {}
+        self.sounds = {}
+        self.programs = {}
+        self.wall_layers = {}
+
+    def texture(self, path):
+        texture = self.textures.get(path)
+        if texture is None:
+            texture = arcade.load_texture(path)
+            self.textures[path] = texture
+        return texture
+
+    def sound(self, path):
+        if path not in self.sounds:
+            try:
+                self.sounds[path] = arcade.load_sound(path, streaming=False)
+            except Exception as error:
+                print(f"Звук {path} не загружен: {error}")
+                self.sounds[path] = None
+        return self.sounds[path]
+
+    def program(self, ctx, vertex_shader, fragment_shader):
+        key = (id(ctx), vertex_shader, fragment_shader)
+        program = self.programs.get(key)
+        if program is None:
+            program = ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+            self.programs[key] = program
+        return program
+
+    def wall_layer(self, layout, grid, chunk=None):
+        key = (layout.name, chunk)
+        layer = self.wall_layers.get(key)
+        if layer is None:
+            layer = arcade.SpriteList()
+            texture = self.texture("PNG/Wall.png")
+            min_col, min_row, max_col, max_row = grid.bounds() if chunk is None else grid.chunk_bounds(chunk)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    if grid.is_wall(col, row):
+                        wall = arcade.Sprite(texture)
+                        wall.position = cell_center(col, row)
+                        layer.append(wall)
+            self.wall_layers[key] = layer
+        return layer
+
+    def upload(self, ctx):
+        for texture in self.textures.values():
+            ctx.default_atlas.add(texture)
+        self.program(ctx, POINT_VERTEX_SHADER, POINT_FRAGMENT_SHADER)
+
+    def preload(self, ctx):
+        for path in TEXTURE_FILES:
+            self.texture(path)
+        for path in SOUND_FILES:
+            self.sound(path)
+        self.upload(ctx)
+
+class AssetLoader:
+    def __init__(self, registry):
+        self.registry = registry
+        self.jobs = ([(registry.texture, path) for path in TEXTURE_FILES] +
+                     [(registry.sound, path) for path in SOUND_FILES] +
+                     [(load_level, name) for name in LEVEL_NAMES])
+        self.done = 0
+        self.failures = []
+        self.ready = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="asset-loader", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        for load, name in self.jobs:
+            try:
+                load(name)
+            except Exception as error:
+                self.failures.append((name, error))
+                print(f"Не удалось загрузить {name}: {error}")
+            finally:
+                self.done += 1
+
+    def progress(self):
+        return self.done / len(self.jobs)
+
+    def poll(self, ctx):
+        if self.thread is None:
+            self.start()
+        if not self.ready and self.done == len(self.jobs):
+            self.registry.upload(ctx)
+            self.ready = True
+        return self.ready
+
+assets = AssetRegistry()
+loader = AssetLoader(assets)
+startup = StartupTimer(STARTED)
+scores = ScoreStore()
+mixer = Mixer()
+
+class TextLayer:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.labels = {}
+
+    def show(self, key, text, x, y, color, font_size, **kwargs):
+        label = self.labels.get(key)
+        if label is None:
+            label = arcade.Text(text, x, y, color, font_size, batch=self.batch, **kwargs)
+            self.labels[key] = label
+        else:
+            label.text = text
+            label.x = x
+            label.y = y
+        return label
+
+    def remove(self, key):
+        label = self.labels.pop(key, None)
+        if label is not None:
+            label.label.delete()
+
+    def clear(self):
+        for label in self.labels.values():
+            label.label.delete()
+        self.labels.clear()
+
+    def draw(self):
+        self.batch.draw()
+
+class FloatingText:
+    def __init__(self, x, y, text, layer):
+        self.layer = layer
+        self.label = layer.show(self, text, x, y, arcade.color.GREEN_YELLOW, 14,
+                                anchor_x="center", bold=True)
         self.alpha = 255
         self.change_y = 1
         self.font_size = 14
 
-    def update(self, delta_time: float = 1 / 60):
-        self.center_y += self.change_y
+    def update(self):
+        self.label.y += self.change_y
         self.alpha -= 3
         if self.font_size < 20:
             self.font_size += 0.2
+            if int(self.font_size) != self.label.font_size:
+                self.label.font_size = int(self.font_size)
         if self.alpha <= 0:
-            self.remove_from_sprite_lists()
-
-    def draw(self, **kwargs):
-        final_color = (
-            int(arcade.color.GREEN_YELLOW[0]),
-            int(arcade.color.GREEN_YELLOW[1]),
-            int(arcade.color.GREEN_YELLOW[2]),
-            int(max(0, self.alpha))
-        )
-        arcade.draw_text(
-            self.text,
-            self.center_x,
-            self.center_y,
-            final_color,
-            int(self.font_size),
-            anchor_x="center",
-            bold=True
-        )
-
-class Particle(arcade.SpriteCircle):
-    def __init__(self, x, y, color):
-        super().__init__(random.randint(2, 4), color)
-        self.center_x = x
-        self.center_y = y
-        speed = random.uniform(2, 6)
-        angle = random.uniform(0, 2 * math.pi)
-        self.change_x = math.cos(angle) * speed
-        self.change_y = math.sin(angle) * speed
-        self.alpha = 255
-        self.fade_rate = random.randint(4, 8)
-
-    def update(self, delta_time: float = 1 / 60):
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-        self.alpha -= self.fade_rate
-        if self.alpha <= 0:
-            self.remove_from_sprite_lists()
-
-class Barrel(arcade.Sprite):
-    def __init__(self, x, y):
-        super().__init__("PNG/Box.png", scale=1.0)
-        self.center_x = x
-        self.center_y = y
-        self.target_x = x
-        self.target_y = y
-        self.hp = 3
-        self.is_moving = False
-        self.move_speed = 4
-        self.textures_list = [
-            arcade.load_texture("PNG/Box1.png"),
-            arcade.load_texture("PNG/Box2.png"),
-            arcade.load_texture("PNG/Box.png")
-        ]
-
-    def update(self, delta_time: float = 1 / 60):
-        if self.is_moving:
-            if self.center_x < self.target_x:
-                self.center_x += self.move_speed
-            elif self.center_x > self.target_x:
-                self.center_x -= self.move_speed
-            elif self.center_y < self.target_y:
-                self.center_y += self.move_speed
-            elif self.center_y > self.target_y:
-                self.center_y -= self.move_speed
-            if (abs(self.center_x - self.target_x) < 4 and
-                    abs(self.center_y - self.target_y) < 4):
-                self.center_x = self.target_x
-                self.center_y = self.target_y
-                self.is_moving = False
-
-    def push(self, dx, dy, walls, barrels):
-        if self.is_moving:
-            return False
-        new_x = self.center_x + dx * TILE_SIZE
-        new_y = self.center_y + dy * TILE_SIZE
-        if (new_x < 20 or new_x > SCREEN_WIDTH - 20 or
-                new_y < 20 or new_y > SCREEN_HEIGHT - 20):
+            self.layer.remove(self)
             return False
-        checker = arcade.SpriteSolidColor(32, 32, arcade.color.WHITE)
-        checker.center_x = new_x
-        checker.center_y = new_y
-        if (arcade.check_for_collision_with_list(checker, walls) or
-                arcade.check_for_collision_with_list(checker, barrels)):
-            return False
-        self.target_x = new_x
-        self.target_y = new_y
-        self.is_moving = True
+        self.label.color = arcade.color.GREEN_YELLOW[:3] + (int(self.alpha),)
         return True
 
-    def take_damage(self):
-        self.hp -= 1
-        if self.hp > 0:
-            self.texture = self.textures_list[self.hp - 1]
-        return self.hp <= 0
-
-class GridTank(arcade.Sprite):
-    def __init__(self, image_file, x, y, speed=4, scale=1.5):
-        super().__init__(image_file, scale=scale)
-        self.center_x = x
-        self.center_y = y
-        self.target_x = x
-        self.target_y = y
-        self.is_moving = False
-        self.move_speed = speed
-        self.logical_angle = -90
-        self.angle = self.logical_angle + ANGLE_OFFSET
-
-    def update(self, delta_time: float = 1 / 60):
-        if self.is_moving:
-            if self.center_x < self.target_x:
-                self.center_x += self.move_speed
-            elif self.center_x > self.target_x:
-                self.center_x -= self.move_speed
-            elif self.center_y < self.target_y:
-                self.center_y += self.move_speed
-            elif self.center_y > self.target_y:
-                self.center_y -= self.move_speed
-            if (abs(self.center_x - self.target_x) < 4 and
-                    abs(self.center_y - self.target_y) < 4):
-                self.center_x = self.target_x
-                self.center_y = self.target_y
-                self.is_moving = False
-
-    def start_move(self, dx, dy, logical_angle, walls, barrels):
-        self.logical_angle = logical_angle
-        self.angle = logical_angle + ANGLE_OFFSET
-        if self.is_moving:
-            return
-        new_x = self.center_x + dx * TILE_SIZE
-        new_y = self.center_y + dy * TILE_SIZE
-        if (new_x < 20 or new_x > SCREEN_WIDTH - 20 or
-                new_y < 20 or new_y > SCREEN_HEIGHT - 20):
-            return
-        checker = arcade.SpriteSolidColor(25, 25, arcade.color.WHITE)
-        checker.center_x = new_x
-        checker.center_y = new_y
-        hit_barrels = arcade.check_for_collision_with_list(checker, barrels)
-        if hit_barrels:
-            if hit_barrels[0].push(dx, dy, walls, barrels):
-                self.target_x = new_x
-                self.target_y = new_y
-                self.is_moving = True
+class PointBatch:
+    def __init__(self, ctx, capacity, circular=False):
+        self.ctx = ctx
+        self.capacity = capacity
+        self.circular = circular
+        self.program = assets.program(ctx, POINT_VERTEX_SHADER, POINT_FRAGMENT_SHADER)
+        self.pos_buffer = ctx.buffer(reserve=capacity * 8)
+        self.size_buffer = ctx.buffer(reserve=capacity * 4)
+        self.color_buffer = ctx.buffer(reserve=capacity * 4)
+        quad = ctx.buffer(data=np.array([-0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5, -0.5], dtype=np.float32))
+        self.geometry = ctx.geometry(
+            [
+                BufferDescription(quad, "2f", ["in_vert"]),
+                BufferDescription(self.pos_buffer, "2f", ["in_pos"], instanced=True),
+                BufferDescription(self.size_buffer, "1f", ["in_size"], instanced=True),
+                BufferDescription(self.color_buffer, "4f1", ["in_color"],
+                                  normalized=["in_color"], instanced=True),
+            ],
+            mode=ctx.TRIANGLE_STRIP,
+        )
+
+    def draw(self, positions, sizes, colors):
+        count = min(len(positions), self.capacity)
+        if count == 0:
             return
-        if not arcade.check_for_collision_with_list(checker, walls):
-            self.target_x = new_x
-            self.target_y = new_y
-            self.is_moving = True
-
-class Boss(GridTank):
-    def __init__(self, x, y):
-        super().__init__("PNG/Boss.png", x, y, speed=0, scale=2.0)
-        self.hp = 10
-        self.shoot_timer = 0
-        self.logical_angle = 0
-
-    def update_aim(self, player_x, player_y):
-        dx = player_x - self.center_x
-        dy = player_y - self.center_y
-        rad = math.atan2(dy, dx)
-        self.logical_angle = math.degrees(rad)
-        self.angle = self.logical_angle - 90
-
-    def take_damage(self):
-        self.hp -= 1
-        return self.hp <= 0
-
-    def update(self, delta_time: float = 1 / 60):
-        super().update()
-
-    def shoot_fan(self, bullet_list):
-        for offset in [-20, 0, 20]:
-            angle = self.logical_angle + offset
-            rad = math.radians(angle)
-            bullet = arcade.SpriteSolidColor(8, 8, arcade.color.RED)
-            bullet.center_x = self.center_x + math.cos(rad) * 60
-            bullet.center_y = self.center_y + math.sin(rad) * 60
-            bullet.change_x = math.cos(rad) * (BULLET_SPEED * 1.2)
-            bullet.change_y = math.sin(rad) * (BULLET_SPEED * 1.2)
-            bullet.is_enemy = True
-            bullet_list.append(bullet)
+        self.pos_buffer.write(np.ascontiguousarray(positions[:count], dtype=np.float32))
+        self.size_buffer.write(np.ascontiguousarray(sizes[:count], dtype=np.float32))
+        self.color_buffer.write(np.ascontiguousarray(colors[:count], dtype=np.uint8))
+        self.program["circular"] = self.circular
+        self.ctx.enable(self.ctx.BLEND)
+        self.geometry.render(self.program, instances=count)
+
+class ParticleEmitter:
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.capacity = capacity
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 4), dtype=np.uint8)
+        self.alpha = np.zeros(capacity, dtype=np.float32)
+        self.fade = np.zeros(capacity, dtype=np.float32)
+        self.head = 0
+        self.rng = np.random.default_rng()
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alpha > 0))
+
+    def clear(self):
+        self.alpha[:] = 0
+
+    def emit(self, x, y, color, count):
+        count = min(count, self.capacity)
+        slots = (self.head + np.arange(count)) % self.capacity
+        self.head = (self.head + count) % self.capacity
+        speed = self.rng.uniform(2, 6, count)
+        angle = self.rng.uniform(0, 2 * math.pi, count)
+        self.pos[slots] = x, y
+        self.vel[slots, 0] = np.cos(angle) * speed
+        self.vel[slots, 1] = np.sin(angle) * speed
+        self.size[slots] = self.rng.integers(2, 5, count) * 2
+        self.color[slots] = tuple(color)[:3] + (255,)
+        self.alpha[slots] = 255
+        self.fade[slots] = self.rng.integers(4, 9, count)
+
+    def update(self):
+        self.pos += self.vel
+        np.subtract(self.alpha, self.fade, out=self.alpha)
+        np.maximum(self.alpha, 0, out=self.alpha)
+
+    def draw(self, batch, blend=1.0):
+        slots = np.flatnonzero(self.alpha > 0)
+        colors = self.color[slots]
+        colors[:, 3] = self.alpha[slots]
+        batch.draw(self.pos[slots] - self.vel[slots] * (1 - blend), self.size[slots], colors)
 
 class GameView(arcade.View):
-    def __init__(self):
+    def __init__(self, seed=None, replay=None, sim=None, level=1):
         super().__init__()
-        self.level = 1
-        self.lives = 3
-        self.score = 0
+        if sim is not None:
+            self.sim = sim
+            self.recording = None
+            self.playback = None
+        elif replay is None:
+            self.sim = Simulation(seed, level)
+            self.recording = Replay(self.sim.seed, self.sim.level)
+            self.playback = None
+        else:
+            self.sim = Simulation(replay.seed, replay.level)
+            self.recording = None
+            self.playback = replay.by_tick()
+        self.replay_end = replay.end_tick if replay is not None else None
+        self.saves_enabled = sim is None and replay is None
+        self.online = sim is not None
+        self.save_slot = 1
         self.player_list = arcade.SpriteList()
-        self.wall_list = arcade.SpriteList(use_spatial_hash=True)
+        self.wall_chunks = []
         self.barrel_list = arcade.SpriteList()
         self.enemy_list = arcade.SpriteList()
-        self.bullet_list = arcade.SpriteList()
-        self.particle_list = arcade.SpriteList()
-        self.player = None
-        self.shoot_sound = arcade.load_sound("Bam.mp3")
-        self.hp_sound = arcade.load_sound("HP.mp3")
-        self.floating_texts = arcade.SpriteList()
+        self.sprites = {}
+        self.bullet_batch = PointBatch(self.window.ctx, BULLET_CAPACITY)
+        self.bullet_colors = np.array([arcade.color.WHITE, arcade.color.RED], dtype=np.uint8)
+        self.particles = ParticleEmitter()
+        self.particle_batch = PointBatch(self.window.ctx, PARTICLE_CAPACITY, circular=True)
+        self.shoot_sound = assets.sound(SHOOT_SOUND)
+        self.hp_sound = assets.sound(HP_SOUND)
+        self.floating_texts = []
+        self.world_text = TextLayer()
+        self.hud_text = TextLayer()
+        self.barrel_textures = [
+            assets.texture("PNG/Box1.png"),
+            assets.texture("PNG/Box2.png"),
+            assets.texture("PNG/Box.png")
+        ]
+        self.inputs = []
+        self.accumulator = 0.0
+        self.blend = 1.0
+        self.previous = {}
         self.camera = arcade.camera.Camera2D()
         self.is_zoomed = False
+        self.profiler = make_profiler()
+        self.sim.profiler = self.profiler
+        self.show_profiler = False
+        self.profiler_text = TextLayer()
 
-    def setup_secret_level(self):
-        self.level = 999
-        self.player_list.clear()
-        self.wall_list.clear()
-        self.barrel_list.clear()
-        self.enemy_list.clear()
-        self.bullet_list.clear()
-        self.particle_list.clear()
-        self.player = GridTank("PNG/Me.png", 420, 60, speed=4)
-        self.player_list.append(self.player)
-        self.boss = Boss(420, 540)
-        self.enemy_list.append(self.boss)
-        for col in range(1, (SCREEN_WIDTH // TILE_SIZE) - 1):
-            for row in range(3, (SCREEN_HEIGHT // TILE_SIZE) - 3):
-                x = col * TILE_SIZE + 20
-                y = row * TILE_SIZE + 20
-                if random.random() < 0.15:
-                    self.barrel_list.append(Barrel(x, y))
+    @property
+    def level(self):
+        return self.sim.level
+
+    @property
+    def lives(self):
+        return self.sim.lives
+
+    @property
+    def score(self):
+        return self.sim.score
 
     def setup(self):
+        self.sim.setup()
+        self._process_events()
+        self._sync_sprites()
+
+    def setup_secret_level(self):
+        self.sim.setup_secret_level()
+        self._process_events()
+        self._sync_sprites()
+
+    def _build_level(self):
         self.player_list.clear()
-        self.wall_list.clear()
+        self.wall_chunks = []
         self.barrel_list.clear()
         self.enemy_list.clear()
-        self.bullet_list.clear()
-        self.particle_list.clear()
+        self.sprites.clear()
+        self.particles.clear()
         self.floating_texts.clear()
-        for row_idx, row in enumerate(MAP_DATA):
-            for col_idx, cell in enumerate(row):
-                if cell == 1:
-                    wall = arcade.Sprite("PNG/Wall.png", scale=1.0)
-                    wall.center_x = col_idx * TILE_SIZE + 20
-                    wall.center_y = SCREEN_HEIGHT - (row_idx * TILE_SIZE + 20)
-                    self.wall_list.append(wall)
-        self.player = GridTank("PNG/Me.png", 420, 60, speed=4)
-        self.player_list.append(self.player)
-        for _ in range(10 + self.level * 2):
-            while True:
-                barrel_x = random.randint(1, 18) * 40 + 20
-                barrel_y = random.randint(1, 13) * 40 + 20
-                checker = arcade.SpriteCircle(15, arcade.color.WHITE)
-                checker.center_x = barrel_x
-                checker.center_y = barrel_y
-                if not (arcade.check_for_collision_with_list(checker, self.wall_list) or
-                        arcade.check_for_collision(checker, self.player)):
-                    self.barrel_list.append(Barrel(barrel_x, barrel_y))
-                    break
-        for i in range(self.level * 2 + 1):
-            spawn_points = [(60, 540), (740, 540), (60, 300),
-                            (740, 300), (420, 540)]
-            pos = spawn_points[i % len(spawn_points)]
-            enemy = GridTank("PNG/Enemy.png", pos[0], pos[1],
-                             speed=2 + (self.level * 0.4))
-            enemy.logical_angle = 270
-            enemy.angle = 180
-            enemy.shoot_timer = 0
-            self.enemy_list.append(enemy)
-
-    def create_explosion(self, x, y, color, count=20):
-        for _ in range(count):
-            self.particle_list.append(Particle(x, y, color))
+        self.world_text.clear()
+        self.profiler.reset_worst()
+
+    def _add_sprite(self, entity):
+        if isinstance(entity, Barrel):
+            sprite = arcade.Sprite(self.barrel_textures[entity.hp - 1], scale=1.0)
+            self.barrel_list.append(sprite)
+            self.world_text.show(entity, str(entity.hp), entity.center_x, entity.center_y - 7,
+                                 arcade.color.WHITE, 10, anchor_x="center", bold=True)
+        elif entity is self.sim.player:
+            sprite = arcade.Sprite(assets.texture("PNG/Me.png"), scale=1.5)
+            self.player_list.append(sprite)
+        elif entity in self.sim.players:
+            sprite = arcade.Sprite(assets.texture("PNG/Me.png"), scale=1.5)
+            sprite.color = PLAYER_COLORS[entity.slot % len(PLAYER_COLORS)]
+            self.player_list.append(sprite)
+        elif isinstance(entity, Boss):
+            sprite = arcade.Sprite(assets.texture("PNG/Boss.png"), scale=2.0)
+            self.enemy_list.append(sprite)
+        else:
+            sprite = arcade.Sprite(assets.texture("PNG/Enemy.png"), scale=1.5)
+            self.enemy_list.append(sprite)
+        sprite.position = entity.center_x, entity.center_y
+        self.sprites[entity] = sprite
+        return sprite
+
+    def _drop_sprite(self, entity):
+        sprite = self.sprites.pop(entity, None)
+        if sprite is not None:
+            sprite.remove_from_sprite_lists()
+            self.world_text.remove(entity)
+
+    def _process_events(self):
+        for event in self.sim.events:
+            kind = event[0]
+            if kind == "level":
+                self._build_level()
+            elif kind == "shoot":
+                mixer.play(self.shoot_sound, event[1], event[2])
+            elif kind == "explosion":
+                self.create_explosion(event[1], event[2], event[3])
+            elif kind == "life":
+                mixer.play(self.hp_sound, event[1], event[2])
+                self.floating_texts.append(FloatingText(event[1], event[2], "+1 LIFE", self.world_text))
+            elif kind == "barrel_hit":
+                barrel = event[1]
+                if barrel in self.sprites:
+                    self.sprites[barrel].texture = self.barrel_textures[barrel.hp - 1]
+                    self.world_text.labels[barrel].text = str(barrel.hp)
+            elif kind == "wave":
+                self._notice(f"WAVE {event[1]}")
+            elif kind == "removed":
+                self._drop_sprite(event[1])
+            elif kind == "level_stats":
+                scores.record_level(event[1], event[2] * TICK, event[3], event[4], event[5])
+            elif kind == "game_over":
+                rank = scores.submit(self.score, self.sim.level, event[1])
+                if self.online:
+                    continue
+                start = ENDLESS_LEVEL if self.level == ENDLESS_LEVEL else 1
+                self.window.show_view(GameOverView(event[1], self.score, rank, start,
+                                                   self.sim.level, scores.level_stats(self.sim.level)))
+        self.sim.events.clear()
+
+    def _notice(self, text):
+        player = self.sim.player
+        self.floating_texts.append(FloatingText(player.center_x, player.center_y + 30, text, self.world_text))
+
+    def quick_save(self):
+        try:
+            SaveGame.capture(self.sim).save(slot_path(self.save_slot))
+        except OSError as error:
+            print(f"Не удалось сохранить игру: {error}")
+            self._notice("SAVE FAILED")
+            return
+        self._notice(f"SAVED {self.save_slot}")
+
+    def quick_load(self):
+        tick = self.sim.tick
+        try:
+            save = load_save(slot_path(self.save_slot))
+        except FileNotFoundError:
+            self._notice(f"SLOT {self.save_slot} EMPTY")
+            return
+        except (OSError, ValueError) as error:
+            print(f"Не удалось загрузить сохранение: {error}")
+            self._notice("LOAD FAILED")
+            return
+        try:
+            save.apply(self.sim)
+        except FileNotFoundError as error:
+            print(f"Уровень сохранения не найден: {error}")
+            self._notice("SAVED LEVEL MISSING")
+            return
+        except (OSError, ValueError) as error:
+            print(f"Не удалось загрузить сохранение: {error}")
+            self._notice("LOAD FAILED")
+            return
+        if self.recording is not None:
+            self.recording.finish(tick)
+            self.recording.save()
+            self.recording = None
+        self.inputs = []
+        self.accumulator = 0.0
+        self._process_events()
+        self._sync_sprites()
+        self._notice(f"LOADED {self.save_slot}")
+
+    def _view_bounds(self):
+        x, y = self.camera.position
+        half_width = SCREEN_WIDTH / self.camera.zoom / 2 + TILE_SIZE
+        half_height = SCREEN_HEIGHT / self.camera.zoom / 2 + TILE_SIZE
+        return to_cell(x - half_width, y - half_height) + to_cell(x + half_width, y + half_height)
+
+    def _sync_sprites(self):
+        grid = self.sim.grid
+        min_col, min_row, max_col, max_row = bounds = self._view_bounds()
+        chunks = grid.chunks_in(*bounds)
+        if min_col <= 0 and min_row <= 0 and max_col >= grid.cols - 1 and max_row >= grid.rows - 1:
+            self.wall_chunks = [None]
+        else:
+            self.wall_chunks = chunks
+        tanks = {self.sim.player}
+        barrels = set()
+        for chunk in chunks:
+            for tank in grid.chunk_tanks[chunk]:
+                if min_col <= tank.cell[0] <= max_col and min_row <= tank.cell[1] <= max_row:
+                    tanks.add(tank)
+            for barrel in grid.chunk_barrels[chunk]:
+                if min_col <= barrel.cell[0] <= max_col and min_row <= barrel.cell[1] <= max_row:
+                    barrels.add(barrel)
+        for entity in [entity for entity in self.sprites if entity not in tanks and entity not in barrels]:
+            self._drop_sprite(entity)
+        tick = self.sim.tick
+        for tank in tanks:
+            sprite = self.sprites.get(tank) or self._add_sprite(tank)
+            sprite.position = self._interpolate(tank)
+            sprite.angle = tank.logical_angle + ANGLE_OFFSET
+            sprite.alpha = 110 if tick < tank.safe_until and (tank.safe_until - tick) // 8 % 2 else 255
+        for barrel in barrels:
+            sprite = self.sprites.get(barrel) or self._add_sprite(barrel)
+            position = self._interpolate(barrel)
+            if sprite.position != position:
+                sprite.position = position
+                label = self.world_text.labels[barrel]
+                label.x = position[0]
+                label.y = position[1] - 7
+
+    def _remember_positions(self):
+        self.previous = {entity: (entity.center_x, entity.center_y) for entity in self.sprites}
+
+    def _interpolate(self, entity):
+        previous = self.previous.get(entity)
+        if previous is None:
+            return entity.center_x, entity.center_y
+        dx = entity.center_x - previous[0]
+        dy = entity.center_y - previous[1]
+        if abs(dx) > TILE_SIZE or abs(dy) > TILE_SIZE:
+            return entity.center_x, entity.center_y
+        return previous[0] + dx * self.blend, previous[1] + dy * self.blend
+
+    def create_explosion(self, x, y, effect):
+        color, count = EXPLOSIONS[effect]
+        self.particles.emit(x, y, color, count)
 
     def on_draw(self):
+        profiler = self.profiler
+        profiler.resume()
         self.clear()
         with self.camera.activate():
-            self.wall_list.draw()
+            for chunk in self.wall_chunks:
+                assets.wall_layer(self.sim.layout, self.sim.grid, chunk).draw()
             self.barrel_list.draw()
             self.enemy_list.draw()
-            self.bullet_list.draw()
+            profiler.mark("draw_sprites")
+            bullets = self.sim.bullets
+            slots = bullets.live()
+            self.bullet_batch.draw(bullets.pos[slots] - bullets.vel[slots] * (1 - self.blend),
+                                   bullets.size[slots],
+                                   self.bullet_colors[bullets.is_enemy[slots].astype(np.intp)])
+            profiler.mark("draw_bullets")
             self.player_list.draw()
-            self.particle_list.draw()
-            for text_sprite in self.floating_texts:
-                text_sprite.draw()
-            for barrel in self.barrel_list:
-                arcade.draw_text(
-                    str(barrel.hp),
-                    barrel.center_x,
-                    barrel.center_y - 7,
-                    arcade.color.WHITE,
-                    10,
-                    anchor_x="center",
-                    bold=True
-                )
+            profiler.mark("draw_sprites")
+            self.particles.draw(self.particle_batch, self.blend)
+            profiler.mark("draw_particles")
+            self.world_text.draw()
+            profiler.mark("draw_text")
         self.window.default_camera.use()
-        arcade.draw_text(
-            f"SCORE: {self.score} | LIVES: {self.lives} | LEVEL: {self.level}",
-            10, 575,
-            arcade.color.WHITE,
-            12,
-            bold=True
-        )
-        arcade.draw_text(
-            "M: MENU | R: RESET | F: ZOOM",
-            600, 575,
-            arcade.color.LIGHT_GRAY,
-            10,
-            bold=True
-        )
+        stage = f"WAVE: {self.sim.wave}" if self.level == ENDLESS_LEVEL else f"LEVEL: {self.level}"
+        self.hud_text.show("status", f"SCORE: {self.score} | LIVES: {self.lives} | {stage}",
+                           10, 575, arcade.color.WHITE, 12, bold=True)
+        if self.saves_enabled:
+            self.hud_text.show("help", f"M: MENU | R: RESET | F: ZOOM | F5/F9: SAVE/LOAD {self.save_slot}",
+                               450, 575, arcade.color.LIGHT_GRAY, 10, bold=True)
+        else:
+            self.hud_text.show("help", "M: MENU | R: RESET | F: ZOOM",
+                               600, 575, arcade.color.LIGHT_GRAY, 10, bold=True)
+        if self.sim.mode == VERSUS:
+            frags = " | ".join(f"P{player.slot + 1}: {player.frags}"
+                               for player in sorted(self.sim.players, key=lambda player: player.slot))
+            self.hud_text.show("frags", f"FRAGS: {frags}", 10, 555, arcade.color.GOLD, 12, bold=True)
+        if self.online and self.sim.result is not None:
+            self.hud_text.show("result", self.sim.result, 400, 330, arcade.color.GOLD, 40, anchor_x="center")
+            self.hud_text.show("waiting", "NEXT MATCH IS STARTING...", 400, 280,
+                               arcade.color.WHITE, 16, anchor_x="center")
+        else:
+            self.hud_text.remove("result")
+            self.hud_text.remove("waiting")
+        self.hud_text.draw()
+        profiler.mark("draw_hud")
+        if "imports" in startup.stages and startup.mark("first_playable"):
+            print(startup.report())
+            startup.save()
+        if profiler.enabled:
+            profiler.count("enemies", len(self.sim.enemies))
+            profiler.count("barrels", len(self.sim.barrels))
+            profiler.count("bullets", len(self.sim.bullets))
+            profiler.count("particles", len(self.particles))
+            profiler.count("labels", len(self.world_text.labels))
+            profiler.count("sprites", len(self.sprites))
+            profiler.count("voices", mixer.active())
+            profiler.count("sounds", mixer.played)
+            profiler.count("merged", mixer.merged)
+            profiler.count("culled", mixer.culled)
+            profiler.end_frame()
+            if self.show_profiler:
+                self._draw_profiler()
+
+    def _draw_profiler(self):
+        profiler = self.profiler
+        left, bottom, width, height = 10, 330, 360, 230
+        arcade.draw_lrbt_rectangle_filled(left, left + width, bottom, bottom + height, (0, 0, 0, 180))
+        graph_bottom = bottom + 10
+        ms_to_px = 3
+        budget_y = graph_bottom + 1000 / 60 * ms_to_px
+        arcade.draw_line(left, budget_y, left + width, budget_y, arcade.color.RED, 1)
+        points = [(left + i * width / profiler.history.maxlen, graph_bottom + total * 1000 * ms_to_px)
+                  for i, total in enumerate(profiler.history)]
+        if len(points) > 1:
+            arcade.draw_line_strip(points, arcade.color.LIME_GREEN)
+        if profiler.frame % 15 == 0:
+            lines = [f"{name:<15}{seconds * 1000:6.2f} ms" for name, seconds in
+                     sorted(profiler.averages.items(), key=lambda item: -item[1])]
+            worst = profiler.worst
+            lines.append(f"worst frame #{worst['frame']}: {worst['total'] * 1000:.2f} ms")
+            lines.append(" ".join(f"{name}={value}" for name, value in profiler.counts.items()))
+            self.profiler_text.show("stats", "\n".join(lines), left + 5, bottom + height - 5,
+                                    arcade.color.WHITE, 9, multiline=True, width=width - 10,
+                                    anchor_y="top", font_name="courier")
+        self.profiler_text.draw()
 
     def on_update(self, delta_time):
-        for enemy in self.enemy_list:
-            if isinstance(enemy, Boss):
-                enemy.update_aim(self.player.center_x, self.player.center_y)
-        self.player_list.update()
-        self.enemy_list.update()
-        self.barrel_list.update()
-        self.bullet_list.update()
-        self.particle_list.update()
-        self.floating_texts.update()
-        for enemy in self.enemy_list:
-            enemy.shoot_timer += delta_time
-            if isinstance(enemy, Boss):
-                if enemy.shoot_timer > 1.2:
-                    enemy.shoot_fan(self.bullet_list)
-                    enemy.shoot_timer = 0
-            else:
-                if not enemy.is_moving:
-                    dx, dy, angle = random.choice([(1, 0, 0), (-1, 0, 180), (0, 1, 90), (0, -1, 270)])
-                    enemy.start_move(dx, dy, angle, self.wall_list, self.barrel_list)
-                if enemy.shoot_timer > SHOOT_COOLDOWN:
-                    if (abs(enemy.center_x - self.player.center_x) < 30 or
-                            abs(enemy.center_y - self.player.center_y) < 30):
-                        self._fire_bullet(enemy, is_enemy=True)
-                        enemy.shoot_timer = 0
-        for bullet in self.bullet_list[:]:
-            if arcade.check_for_collision_with_list(bullet, self.wall_list):
-                bullet.remove_from_sprite_lists()
-                continue
-            hit_barrels = arcade.check_for_collision_with_list(bullet, self.barrel_list)
-            if hit_barrels:
-                bullet.remove_from_sprite_lists()
-                if hit_barrels[0].take_damage():
-                    self.create_explosion(hit_barrels[0].center_x, hit_barrels[0].center_y, arcade.color.ORANGE)
-                    if random.random() < 0.3:
-                        self.lives += 1
-                        arcade.play_sound(self.hp_sound)
-                        self.floating_texts.append(
-                            FloatingText(hit_barrels[0].center_x, hit_barrels[0].center_y, "+1 LIFE"))
-                    hit_barrels[0].remove_from_sprite_lists()
-                    self.score += 50
-                continue
-            if getattr(bullet, 'is_enemy', False):
-                if arcade.check_for_collision(bullet, self.player):
-                    bullet.remove_from_sprite_lists()
-                    self.lives -= 1
-                    self.create_explosion(self.player.center_x, self.player.center_y, arcade.color.RED_ORANGE, count=30)
-                    if self.lives <= 0:
-                        save_high_score(self.score)
-                        self.window.show_view(GameOverView("DEFEAT", self.score))
-                    else:
-                        if self.level != 999:
-                            self.player.center_x, self.player.center_y = 420, 60
-                            self.player.target_x, self.player.target_y = 420, 60
-            else:
-                hit_enemies = arcade.check_for_collision_with_list(bullet, self.enemy_list)
-                if hit_enemies:
-                    bullet.remove_from_sprite_lists()
-                    target = hit_enemies[0]
-                    if isinstance(target, Boss):
-                        if target.take_damage():
-                            self.create_explosion(target.center_x, target.center_y, arcade.color.GOLD, count=50)
-                            target.remove_from_sprite_lists()
-                            self.score += 1000
-                            self.window.show_view(GameOverView("BOSS DEFEATED!", self.score))
-                        else:
-                            self.create_explosion(target.center_x, target.center_y, arcade.color.WHITE, count=5)
-                    else:
-                        self.create_explosion(target.center_x, target.center_y, arcade.color.YELLOW, count=25)
-                        target.remove_from_sprite_lists()
-                        self.score += 100
-        if not self.enemy_list:
-            if self.level == 999:
-                pass
-            elif self.level < MAX_LEVELS:
-                self.level += 1
-                self.setup()
-            else:
-                save_high_score(self.score)
-                self.window.show_view(GameOverView("VICTORY!", self.score))
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.accumulator = min(self.accumulator + delta_time, MAX_STEPS_PER_FRAME * TICK)
+        while self.accumulator >= TICK and (self.sim.result is None or self.online):
+            self.accumulator -= TICK
+            self._remember_positions()
+            actions = self._next_actions()
+            if actions is None:
+                self.window.show_view(MenuView())
+                return
+            self.sim.step(actions)
+            self._process_events()
+            profiler.mark("events")
+            self.particles.update()
+            profiler.mark("particles")
+            self.floating_texts = [text for text in self.floating_texts if text.update()]
+            profiler.mark("text")
+        self.blend = self.accumulator / TICK
+        self._sync_sprites()
+        profiler.mark("sync")
+        smoothing = 1 - (1 - CAMERA_SMOOTHING) ** (delta_time / TICK)
         target_zoom = 4.0 if self.is_zoomed else 1.0
-        self.camera.zoom = arcade.math.lerp(self.camera.zoom, target_zoom, 0.1)
-        target_pos = list(self.player.position)
+        self.camera.zoom = arcade.math.lerp(self.camera.zoom, target_zoom, smoothing)
+        target_pos = [self.sim.player.center_x, self.sim.player.center_y]
         if self.is_zoomed:
+            world_width = self.sim.grid.cols * TILE_SIZE
+            world_height = self.sim.grid.rows * TILE_SIZE
             view_width = SCREEN_WIDTH / self.camera.zoom
             view_height = SCREEN_HEIGHT / self.camera.zoom
-            target_pos[0] = max(view_width / 2, min(target_pos[0], SCREEN_WIDTH - view_width / 2))
-            target_pos[1] = max(view_height / 2, min(target_pos[1], SCREEN_HEIGHT - view_height / 2))
-        self.camera.position = arcade.math.lerp_2d(self.camera.position, tuple(target_pos), 0.1)
-
-    def _fire_bullet(self, owner, is_enemy=False):
-        visual_angle = owner.logical_angle
-        actual_angle = visual_angle
-        if visual_angle == 0:
-            actual_angle = 180
-        elif visual_angle == 180:
-            actual_angle = 0
-        radians_angle = math.radians(actual_angle)
-        color = arcade.color.RED if is_enemy else arcade.color.WHITE
-        bullet = arcade.SpriteSolidColor(6, 6, color)
-        bullet.center_x = owner.center_x + math.cos(radians_angle) * 25
-        bullet.center_y = owner.center_y + math.sin(radians_angle) * 25
-        bullet.change_x = math.cos(radians_angle) * BULLET_SPEED
-        bullet.change_y = math.sin(radians_angle) * BULLET_SPEED
-        bullet.is_enemy = is_enemy
-        self.bullet_list.append(bullet)
-        arcade.play_sound(self.shoot_sound)
+            target_pos[0] = max(view_width / 2, min(target_pos[0], world_width - view_width / 2))
+            target_pos[1] = max(view_height / 2, min(target_pos[1], world_height - view_height / 2))
+        self.camera.position = arcade.math.lerp_2d(self.camera.position, tuple(target_pos), smoothing)
+        profiler.mark("camera")
+        mixer.update(*self.camera.position, self.camera.zoom)
+        profiler.mark("audio")
+
+    def _next_actions(self):
+        tick = self.sim.tick + 1
+        if self.playback is None:
+            actions = self.inputs
+            self.inputs = []
+            if self.recording is not None:
+                for action in actions:
+                    self.recording.record(tick, action)
+        else:
+            if tick > self.replay_end:
+                return None
+            actions = self.playback.get(tick, [])
+        if MENU in actions:
+            return None
+        for action in actions:
+            if action == ZOOM:
+                self.is_zoomed = not self.is_zoomed
+        return [action for action in actions if action != ZOOM]
+
+    def on_hide_view(self):
+        if self.recording is not None and self.sim.tick > 0:
+            self.recording.finish(self.sim.tick)
+            self.recording.save()
+            self.recording = None
+        self.profiler.close()
+        mixer.stop()
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler and not self.profiler.enabled:
+            self.profiler = FrameProfiler()
+            self.sim.profiler = self.profiler
+        elif not self.show_profiler and self.profiler.log is None:
+            self.profiler = make_profiler()
+            self.sim.profiler = self.profiler
 
     def on_key_press(self, key, modifiers):
-        if key == arcade.key.UP:
-            self.player.start_move(0, 1, 90,
-                                   self.wall_list, self.barrel_list)
-        elif key == arcade.key.DOWN:
-            self.player.start_move(0, -1, 270,
-                                   self.wall_list, self.barrel_list)
-        elif key == arcade.key.LEFT:
-            self.player.start_move(-1, 0, 0,
-                                   self.wall_list, self.barrel_list)
-        elif key == arcade.key.RIGHT:
-            self.player.start_move(1, 0, 180,
-                                   self.wall_list, self.barrel_list)
-        elif key == arcade.key.SPACE:
-            self._fire_bullet(self.player)
-        elif key == arcade.key.M:
+        if key == arcade.key.M:
+            if self.recording is not None:
+                self.recording.record(self.sim.tick + 1, MENU)
             self.window.show_view(MenuView())
-        elif key == arcade.key.R:
-            self.setup()
+        elif key == arcade.key.P:
+            self.toggle_profiler()
+        elif self.playback is not None:
+            return
         elif key == arcade.key.F:
-            self.is_zoomed = not self.is_zoomed
-        elif key == arcade.key.B:
-            print("Активация секретного уровня!")
-            self.setup_secret_level()
+            self.inputs.append(ZOOM)
+        elif key == arcade.key.F5 and self.saves_enabled:
+            self.quick_save()
+        elif key == arcade.key.F9 and self.saves_enabled:
+            self.quick_load()
+        elif key in SLOT_KEYS and self.saves_enabled:
+            self.save_slot = SLOT_KEYS[key]
+        elif key in INPUT_KEYS:
+            if key == arcade.key.B:
+                print("Активация секретного уровня!")
+            self.inputs.append(INPUT_KEYS[key])
 
 class GameOverView(arcade.View):
-    def __init__(self, result_text, final_score):
+    def __init__(self, result_text, final_score, rank=None, level=1, played_level=None, stats=None):
         super().__init__()
         self.result_text = result_text
         self.final_score = final_score
+        self.rank = rank
+        self.level = level
+        self.played_level = played_level
+        self.stats = stats
 
     def on_draw(self):
         self.clear()
@@ -505,6 +771,25 @@ class GameOverView(arcade.View):
             20,
             anchor_x="center"
         )
+        if self.rank is not None:
+            arcade.draw_text(
+                f"LEADERBOARD #{self.rank + 1}",
+                400, 245,
+                arcade.color.CYAN,
+                15,
+                anchor_x="center"
+            )
+        if self.stats is not None:
+            best = self.stats["best_time"]
+            best_text = "-" if best is None else f"{best:.1f} s"
+            arcade.draw_text(
+                f"LEVEL {self.played_level}: PLAYS {self.stats['plays']} | CLEARS {self.stats['clears']} | "
+                f"BEST {best_text} | KILLS {self.stats['kills']}",
+                400, 170,
+                arcade.color.LIGHT_GRAY,
+                12,
+                anchor_x="center"
+            )
         arcade.draw_text(
             "ENTER: RESTART | M: MENU | R: RESET RECORD",
             400, 200,
@@ -515,18 +800,30 @@ class GameOverView(arcade.View):
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.ENTER:
-            game_view = GameView()
+            game_view = GameView(level=self.level)
             game_view.setup()
             self.window.show_view(game_view)
         elif key == arcade.key.M:
             self.window.show_view(MenuView())
         elif key == arcade.key.R:
-            reset_high_score()
+            scores.reset()
             self.window.show_view(MenuView())
 
 class MenuView(arcade.View):
     def on_show_view(self):
-        self.high_score = load_high_score()
+        self.high_score = scores.high_score()
+        self.start_level = None
+
+    def on_update(self, delta_time):
+        if loader.poll(self.window.ctx):
+            startup.mark("assets")
+            if self.start_level is not None and not loader.failures:
+                self.start_game(self.start_level)
+
+    def start_game(self, level=1):
+        game_view = GameView(level=level)
+        game_view.setup()
+        self.window.show_view(game_view)
 
     def on_draw(self):
         self.clear()
@@ -545,43 +842,69 @@ class MenuView(arcade.View):
             20,
             anchor_x="center"
         )
-        arcade.draw_text(
-            "ENTER: START | R: RESET RECORD",
-            400, 200,
-            arcade.color.WHITE,
-            20,
-            anchor_x="center"
-        )
+        if loader.failures:
+            name, error = loader.failures[0]
+            arcade.draw_text(
+                f"LOAD FAILED: {name}: {error}",
+                400, 230,
+                arcade.color.RED,
+                12,
+                anchor_x="center"
+            )
+            arcade.draw_text(
+                f"{len(loader.failures)} ASSET(S) MISSING - SEE CONSOLE",
+                400, 200,
+                arcade.color.WHITE,
+                14,
+                anchor_x="center"
+            )
+        elif loader.ready:
+            arcade.draw_text(
+                "ENTER: START | E: ENDLESS | R: RESET RECORD",
+                400, 200,
+                arcade.color.WHITE,
+                18,
+                anchor_x="center"
+            )
+        else:
+            progress = loader.progress()
+            arcade.draw_lrbt_rectangle_outline(250, 550, 200, 220, arcade.color.WHITE)
+            arcade.draw_lrbt_rectangle_filled(252, 252 + 296 * progress, 202, 218, arcade.color.GOLD)
+            arcade.draw_text(
+                f"LOADING {progress:.0%}" + (" - STARTING" if self.start_level is not None else ""),
+                400, 230,
+                arcade.color.WHITE,
+                12,
+                anchor_x="center"
+            )
+        for i, entry in enumerate(scores.top[:MENU_LEADERS]):
+            arcade.draw_text(
+                f"{i + 1}. {entry['score']}  {entry['result'] or ''}  {entry['date'] or ''}",
+                400, 160 - i * 20,
+                arcade.color.LIGHT_GRAY,
+                12,
+                anchor_x="center"
+            )
+        startup.mark("first_frame")
 
     def on_key_press(self, key, modifiers):
-        if key == arcade.key.ENTER:
-            game_view = GameView()
-            game_view.setup()
-            self.window.show_view(game_view)
+        if key in (arcade.key.ENTER, arcade.key.E):
+            level = ENDLESS_LEVEL if key == arcade.key.E else 1
+            if loader.failures:
+                return
+            if loader.ready:
+                self.start_game(level)
+            else:
+                self.start_level = level
         elif key == arcade.key.R:
-            reset_high_score()
+            scores.reset()
             self.high_score = 0
 
-MAP_DATA = [
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-    [1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1],
-    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
-    [1, 1, 1, 1, 0, 1, 1, 1, 0, 0, 0, 0, 1, 1, 1, 0, 1, 1, 1, 1],
-    [1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-    [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-]
-
 def main():
+    startup.mark("imports")
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    startup.mark("window")
+    loader.start()
     window.show_view(MenuView())
     arcade.run()
 
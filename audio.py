@@ -0,0 +1,97 @@
+import math
+import time
+
+import pyglet
+
+MAX_VOICES = 8
+VOICE_LIMIT = 3
+HEARING_DISTANCE = 600
+MIN_VOLUME = 0.05
+MAX_PAN = 0.8
+
+class Voice:
+    def __init__(self):
+        self.player = pyglet.media.Player()
+        self.sound = None
+        self.started = 0.0
+        self.ends = 0.0
+
+    def start(self, sound, volume, pan, now):
+        player = self.player
+        player.pause()
+        if self.sound is sound and player.source is not None:
+            player.seek(0)
+        else:
+            while player.source is not None:
+                player.next_source()
+            player.queue(sound.source)
+        player.volume = volume
+        player.position = (pan, 0.0, math.sqrt(1 - pan * pan))
+        player.play()
+        self.sound = sound
+        self.started = now
+        self.ends = now + sound.get_length()
+
+class Mixer:
+    def __init__(self, max_voices=MAX_VOICES, voice_limit=VOICE_LIMIT, hearing=HEARING_DISTANCE):
+        self.max_voices = max_voices
+        self.voice_limit = voice_limit
+        self.hearing = hearing
+        self.voices = []
+        self.requests = {}
+        self.played = 0
+        self.merged = 0
+        self.culled = 0
+
+    def play(self, sound, x=None, y=None, volume=1.0):
+        if sound is None:
+            return
+        self.requests.setdefault(sound, []).append((x, y, volume))
+
+    def update(self, camera_x, camera_y, zoom=1.0):
+        if not self.requests:
+            return
+        now = time.perf_counter()
+        for sound, requests in self.requests.items():
+            heard = []
+            for x, y, volume in requests:
+                pan = 0.0
+                if x is not None:
+                    dx = (x - camera_x) * zoom
+                    dy = (y - camera_y) * zoom
+                    volume *= max(0.0, 1 - math.hypot(dx, dy) / self.hearing)
+                    pan = max(-MAX_PAN, min(MAX_PAN, dx / self.hearing))
+                if volume < MIN_VOLUME:
+                    self.culled += 1
+                    continue
+                heard.append((volume, pan))
+            if not heard:
+                continue
+            self.merged += len(heard) - 1
+            volume, pan = max(heard)
+            self._voice(sound, now).start(sound, volume, pan, now)
+            self.played += 1
+        self.requests.clear()
+
+    def _voice(self, sound, now):
+        same = [voice for voice in self.voices if voice.sound is sound and voice.ends > now]
+        if len(same) >= self.voice_limit:
+            return min(same, key=lambda voice: voice.started)
+        for voice in self.voices:
+            if voice.ends <= now:
+                return voice
+        if len(self.voices) < self.max_voices:
+            voice = Voice()
+            self.voices.append(voice)
+            return voice
+        return min(self.voices, key=lambda voice: voice.started)
+
+    def active(self):
+        now = time.perf_counter()
+        return sum(voice.ends > now for voice in self.voices)
+
+    def stop(self):
+        for voice in self.voices:
+            voice.player.pause()
+            voice.ends = 0.0
+        self.requests.clear()
@@ -0,0 +1,168 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import simulation
+from simulation import Simulation, MOVES, TICK, direction_to
+
+MAX_SECONDS = 300
+BOT_MOVES = (simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT)
+FACING = {move[2]: action for action, move in MOVES.items()}
+PARAMS = ("shoot_cooldown", "enemy_speed_scale", "barrel_scale", "life_drop_chance", "boss_hp")
+
+def idle_bot(sim, rng):
+    return []
+
+def random_bot(sim, rng):
+    if sim.tick % 8:
+        return []
+    return [rng.choice(BOT_MOVES + (simulation.FIRE,))]
+
+def hunter_bot(sim, rng):
+    player = sim.player
+    if player.is_moving:
+        return []
+    grid = sim.grid
+    cell = grid.index(*player.cell)
+    for enemy in sim.enemies:
+        target = grid.index(*enemy.cell)
+        if target != cell and sim.sight.can_see(cell, target):
+            action = FACING[direction_to(grid, cell, target)[2]]
+            if MOVES[action][2] == player.logical_angle:
+                return [simulation.FIRE] if sim.tick % 10 == 0 else []
+            return [action]
+    if sim.tick % 4:
+        return []
+    return [rng.choice(BOT_MOVES)]
+
+BOTS = {
+    "idle": idle_bot,
+    "random": random_bot,
+    "hunter": hunter_bot,
+}
+
+def run_game(job):
+    bot_name, params, seed, start, max_ticks = job
+    sim = Simulation(seed, **params)
+    if start == "secret":
+        sim.setup_secret_level()
+    elif start == "endless":
+        sim.setup_endless()
+    else:
+        sim.level = int(start)
+        sim.setup()
+    first_level = sim.level
+    bot = BOTS[bot_name]
+    rng = random.Random(seed)
+    while sim.result is None and sim.tick < max_ticks:
+        sim.step(bot(sim, rng))
+    cleared = sim.level - first_level if sim.level <= simulation.MAX_LEVELS else 0
+    if sim.result in ("VICTORY!", "BOSS DEFEATED!"):
+        cleared += 1
+    return {
+        "bot": bot_name,
+        "params": params,
+        "seed": seed,
+        "ticks": sim.tick,
+        "score": sim.score,
+        "lives": max(sim.lives, 0),
+        "levels_cleared": cleared,
+        "waves": sim.wave if sim.level == simulation.ENDLESS_LEVEL else 0,
+        "result": sim.result or "TIMEOUT",
+    }
+
+def parse_param(text):
+    name, _, values = text.partition("=")
+    if name not in PARAMS:
+        raise argparse.ArgumentTypeError(f"unknown parameter {name!r}, expected one of {', '.join(PARAMS)}")
+    try:
+        return name, [json.loads(value) for value in values.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad values for {name}: {values!r}")
+
+def make_jobs(bots, grid, seeds, first_seed, start, max_ticks):
+    names = [name for name, _ in grid]
+    jobs = []
+    for bot_name in bots:
+        for values in itertools.product(*(values for _, values in grid)):
+            params = dict(zip(names, values))
+            for seed in range(first_seed, first_seed + seeds):
+                jobs.append((bot_name, params, seed, start, max_ticks))
+    return jobs
+
+def summarize(games):
+    rows = {}
+    for game in games:
+        key = (game["bot"], json.dumps(game["params"], sort_keys=True))
+        rows.setdefault(key, []).append(game)
+    table = []
+    for (bot_name, params), group in sorted(rows.items()):
+        count = len(group)
+        table.append({
+            "bot": bot_name,
+            "params": params,
+            "games": count,
+            "survival_s": sum(game["ticks"] for game in group) / count * TICK,
+            "score": sum(game["score"] for game in group) / count,
+            "lives": sum(game["lives"] for game in group) / count,
+            "clear_rate": sum(game["levels_cleared"] > 0 for game in group) / count,
+            "levels_cleared": sum(game["levels_cleared"] for game in group) / count,
+            "waves": sum(game["waves"] for game in group) / count,
+            "win_rate": sum(game["result"] in ("VICTORY!", "BOSS DEFEATED!") for game in group) / count,
+        })
+    return table
+
+def print_table(table):
+    print(f"{'bot':<8} {'games':>6} {'surv s':>8} {'score':>8} {'lives':>6} "
+          f"{'clear':>6} {'levels':>7} {'waves':>6} {'win':>6}  params")
+    for row in table:
+        print(f"{row['bot']:<8} {row['games']:6d} {row['survival_s']:8.1f} {row['score']:8.0f} "
+              f"{row['lives']:6.2f} {row['clear_rate']:6.2f} {row['levels_cleared']:7.2f} "
+              f"{row['waves']:6.1f} {row['win_rate']:6.2f}  {row['params']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tancheke headless batch runner")
+    parser.add_argument("--bot", action="append", choices=list(BOTS),
+                        help="bot player to run, may be repeated (default: hunter)")
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="NAME=V1,V2,... sweep values for " + ", ".join(PARAMS))
+    parser.add_argument("--games", type=int, default=100, help="games per bot and parameter set")
+    parser.add_argument("--seed", type=int, default=1, help="first seed")
+    parser.add_argument("--level", default="1", help="starting level: 1-3, secret or endless")
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS,
+                        help="game time limit per game")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--output", help="write the results table as CSV to this file")
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.bot or ["hunter"], args.param, args.games, args.seed, args.level,
+                     int(args.max_seconds / TICK))
+    start = time.perf_counter()
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            chunk = max(1, len(jobs) // (args.workers * 8))
+            games = list(pool.imap_unordered(run_game, jobs, chunksize=chunk))
+    else:
+        games = [run_game(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    table = summarize(games)
+    print_table(table)
+    ticks = sum(game["ticks"] for game in games)
+    print(f"{len(games)} games, {ticks} ticks in {elapsed:.1f} s on {args.workers} workers "
+          f"({len(games) / elapsed:.1f} games/s, {ticks / elapsed:.0f} ticks/s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(table[0]))
+            writer.writeheader()
+            writer.writerows(table)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import simulation
+from levels import load_level, parse_level
+from simulation import Simulation, GridTank, cell_center
+
+BASELINE_FILE = "bench_baseline.json"
+TOLERANCE = 0.2
+PERCENTILES = (50, 95, 99)
+LARGE_WORLD_REPEAT = 10
+
+def _open_cells(sim):
+    grid = sim.grid
+    return [(col, row) for row in range(grid.rows) for col in range(grid.cols)
+            if grid.is_open(col, row) and not grid.tanks_at(col, row)]
+
+def _populate(sim, enemies, barrels):
+    cells = _open_cells(sim)
+    sim.rng.shuffle(cells)
+    for col, row in cells[:barrels]:
+        sim.add_barrel(*cell_center(col, row))
+    for col, row in cells[barrels:barrels + enemies]:
+        sim.add_enemy(GridTank(*cell_center(col, row), speed=sim.layout.enemy_speed))
+
+def setup_level(sim):
+    sim.setup()
+
+def setup_crowd(sim):
+    sim.setup()
+    _populate(sim, enemies=40, barrels=60)
+
+def setup_boss_storm(sim):
+    sim.setup_secret_level()
+
+def storm_tick(sim, view, frame):
+    if sim.boss is not None:
+        sim.boss.shoot_timer = 2
+
+def explosions_tick(sim, view, frame):
+    if view is not None and frame % 2 == 0:
+        x, y = cell_center(sim.rng.randint(1, 18), sim.rng.randint(1, 13))
+        view.create_explosion(x, y, "boss")
+
+def large_world(repeat=LARGE_WORLD_REPEAT):
+    base = load_level("level1")
+    rows = ["".join("#" if base.walls[row * base.cols + col] else "." for col in range(base.cols))
+            for row in range(base.rows - 1, -1, -1)]
+    lines = [line * repeat for line in rows] * repeat
+    player_col, player_row = base.player
+    middle = len(lines) // 2 - (base.rows - 1 - player_row)
+    line = lines[middle]
+    lines[middle] = line[:player_col] + "P" + line[player_col + 1:]
+    return parse_level("large_world", {"map": lines, "barrel_density": 0.05,
+                                       "enemy_speed": base.enemy_speed})
+
+def setup_large_world(sim):
+    sim._reset_world(large_world())
+    sim._place_barrels()
+    cells = _open_cells(sim)
+    sim.rng.shuffle(cells)
+    for col, row in cells[:400]:
+        sim.add_enemy(GridTank(*cell_center(col, row), speed=sim.layout.enemy_speed))
+
+def setup_endless(sim):
+    sim.setup_endless()
+    cells = _open_cells(sim)
+    sim.rng.shuffle(cells)
+    for col, row in cells[:300]:
+        sim._spawn_enemy(col, row)
+    sim.wave_size = 300
+
+def setup_zoomed(sim):
+    sim.setup()
+    _populate(sim, enemies=10, barrels=20)
+
+SCENARIOS = {
+    "level": {"setup": setup_level},
+    "crowd": {"setup": setup_crowd},
+    "boss_storm": {"setup": setup_boss_storm, "tick": storm_tick},
+    "explosions": {"setup": setup_level, "tick": explosions_tick, "draw_only": True},
+    "zoomed": {"setup": setup_zoomed, "zoomed": True, "draw_only": True},
+    "large_world": {"setup": setup_large_world, "zoomed": True},
+    "endless": {"setup": setup_endless},
+}
+
+def scripted_inputs(rng, frame):
+    if frame % 8:
+        return []
+    return [rng.choice((simulation.UP, simulation.DOWN, simulation.LEFT,
+                        simulation.RIGHT, simulation.FIRE))]
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    stats = {}
+    for p in PERCENTILES:
+        stats[f"p{p}"] = ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+    stats["max"] = ordered[-1] * 1000
+    return stats
+
+class Runner:
+    def __init__(self, name, seed, draw):
+        spec = SCENARIOS[name]
+        self.tick_hook = spec.get("tick")
+        self.inputs = random.Random(seed)
+        self.view = None
+        if draw:
+            import Main
+            self.view = Main.GameView(seed)
+            self.sim = self.view.sim
+            self.view.is_zoomed = spec.get("zoomed", False)
+        else:
+            self.sim = Simulation(seed)
+        spec["setup"](self.sim)
+        self.sim.lives = 10 ** 6
+        if self.view is not None:
+            self.view._process_events()
+
+    def frame(self, frame):
+        if self.tick_hook is not None:
+            self.tick_hook(self.sim, self.view, frame)
+        if self.view is None:
+            start = time.perf_counter()
+            self.sim.step(scripted_inputs(self.inputs, frame))
+            return time.perf_counter() - start, None
+        self.view.inputs.extend(scripted_inputs(self.inputs, frame))
+        start = time.perf_counter()
+        self.view.on_update(simulation.TICK)
+        middle = time.perf_counter()
+        self.view.on_draw()
+        self.view.window.ctx.finish()
+        return middle - start, time.perf_counter() - middle
+
+def run_scenario(name, frames, seed, draw):
+    runner = Runner(name, seed, draw)
+    update_times = []
+    draw_times = []
+    blocks_before = sys.getallocatedblocks()
+    gc_before = sum(stat["collections"] for stat in gc.get_stats())
+    for frame in range(frames):
+        update_time, draw_time = runner.frame(frame)
+        update_times.append(update_time)
+        if draw_time is not None:
+            draw_times.append(draw_time)
+    blocks_after = sys.getallocatedblocks()
+    gc_after = sum(stat["collections"] for stat in gc.get_stats())
+
+    tracemalloc.start()
+    for frame in range(frames, frames + max(1, frames // 5)):
+        runner.frame(frame)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {
+        "frames": frames,
+        "update_ms": percentiles(update_times),
+        "net_block_growth_per_frame": (blocks_after - blocks_before) / frames,
+        "gc_collections": gc_after - gc_before,
+        "peak_kb": peak / 1024,
+        "bullets": len(runner.sim.bullets),
+        "enemies": len(runner.sim.enemies),
+    }
+    if draw_times:
+        result["draw_ms"] = percentiles(draw_times)
+    return result
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ("update_ms", "draw_ms"):
+            if metric in result and metric in reference:
+                old = reference[metric]["p95"]
+                new = result[metric]["p95"]
+                if new > old * (1 + tolerance):
+                    regressions.append(f"{name}: {metric} p95 {old:.3f} -> {new:.3f}")
+        if result["peak_kb"] > reference["peak_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak_kb {reference['peak_kb']:.0f} -> {result['peak_kb']:.0f}")
+    return regressions
+
+def print_results(results):
+    print(f"{'scenario':<12} {'upd p50':>8} {'upd p95':>8} {'upd p99':>8} "
+          f"{'drw p50':>8} {'drw p95':>8} {'blk grw':>8} {'peak kb':>8}")
+    for name, result in results.items():
+        update = result["update_ms"]
+        drawing = result.get("draw_ms", {"p50": 0.0, "p95": 0.0})
+        print(f"{name:<12} {update['p50']:8.3f} {update['p95']:8.3f} {update['p99']:8.3f} "
+              f"{drawing['p50']:8.3f} {drawing['p95']:8.3f} "
+              f"{result['net_block_growth_per_frame']:8.2f} {result['peak_kb']:8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tancheke update/draw benchmark")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS),
+                        help="scenarios to run: " + ", ".join(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--draw", action="store_true",
+                        help="also time GameView.on_draw in an offscreen window")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    if args.draw:
+        os.environ.setdefault("ARCADE_HEADLESS", "1")
+        import arcade
+        import Main
+        window = arcade.Window(simulation.SCREEN_WIDTH, simulation.SCREEN_HEIGHT,
+                               "benchmark", visible=False)
+        Main.assets.preload(window.ctx)
+
+    results = {}
+    for name in args.scenarios:
+        if SCENARIOS[name].get("draw_only") and not args.draw:
+            print(f"skipping {name}: it only differs from other scenarios when drawing, run with --draw")
+            continue
+        results[name] = run_scenario(name, args.frames, args.seed, args.draw)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
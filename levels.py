@@ -0,0 +1,135 @@
+import json
+import marshal
+import os
+from array import array
+
+from patterns import DEFAULT_PATTERNS, compile_patterns
+
+LEVEL_DIR = "levels"
+CACHE_DIR = os.path.join(LEVEL_DIR, ".cache")
+CACHE_VERSION = 2
+
+WALL = "#"
+FLOOR = "."
+BARE_FLOOR = "-"
+PLAYER = "P"
+BOSS = "B"
+
+_loaded = {}
+
+class Level:
+    def __init__(self, name, cols, rows, walls, barrel_cells, player, enemy_spawns, boss,
+                 barrels, barrel_density, enemy_speed, waves, boss_phases=None):
+        self.name = name
+        self.cols = cols
+        self.rows = rows
+        self.walls = walls
+        self.barrel_cells = barrel_cells
+        self.player = player
+        self.enemy_spawns = enemy_spawns
+        self.boss = boss
+        self.barrels = barrels
+        self.barrel_density = barrel_density
+        self.enemy_speed = enemy_speed
+        self.waves = waves
+        self.boss_phases = boss_phases
+        self.boss_patterns = compile_patterns(boss_phases, name) if boss_phases is not None else DEFAULT_PATTERNS
+
+    def barrel_count(self):
+        if self.barrel_density:
+            return round(len(self.barrel_cells) * self.barrel_density)
+        return min(self.barrels, len(self.barrel_cells))
+
+    def to_record(self):
+        return (self.name, self.cols, self.rows, bytes(self.walls),
+                array("I", self.barrel_cells).tobytes(), self.player,
+                tuple(self.enemy_spawns), self.boss, self.barrels, self.barrel_density,
+                self.enemy_speed, tuple(self.waves), self.boss_phases)
+
+    @classmethod
+    def from_record(cls, record):
+        (name, cols, rows, walls, barrel_cells, player, enemy_spawns, boss,
+         barrels, barrel_density, enemy_speed, waves, boss_phases) = record
+        cells = array("I")
+        cells.frombytes(barrel_cells)
+        return cls(name, cols, rows, walls, cells.tolist(), player, list(enemy_spawns), boss,
+                   barrels, barrel_density, enemy_speed, list(waves), boss_phases)
+
+def parse_level(name, data):
+    lines = data.get("map") if isinstance(data, dict) else None
+    if not isinstance(lines, list) or not lines or not all(isinstance(line, str) for line in lines):
+        raise ValueError(f"{name}: 'map' must be a non-empty list of strings")
+    rows = len(lines)
+    cols = len(lines[0])
+    if cols == 0:
+        raise ValueError(f"{name}: map rows are empty")
+    walls = bytearray(cols * rows)
+    barrel_cells = []
+    player = None
+    boss = None
+    spawns = {}
+    for line_idx, line in enumerate(lines):
+        if len(line) != cols:
+            raise ValueError(f"{name}: map row {line_idx} has {len(line)} cells, expected {cols}")
+        row = rows - 1 - line_idx
+        for col, char in enumerate(line):
+            i = row * cols + col
+            if char == WALL:
+                walls[i] = 1
+            elif char == FLOOR:
+                barrel_cells.append(i)
+            elif char == PLAYER:
+                player = (col, row)
+            elif char == BOSS:
+                boss = (col, row)
+            elif char.isdigit():
+                spawns[int(char)] = (col, row)
+            elif char != BARE_FLOOR:
+                raise ValueError(f"{name}: unknown map cell {char!r} at row {line_idx}, col {col}")
+    if player is None:
+        raise ValueError(f"{name}: map has no player start '{PLAYER}'")
+    waves = data.get("waves", [])
+    if waves and not spawns:
+        raise ValueError(f"{name}: enemy waves need at least one numbered spawn point")
+    return Level(name, cols, rows, bytes(walls), barrel_cells, player,
+                 [spawns[key] for key in sorted(spawns)], boss,
+                 data.get("barrels", 0), data.get("barrel_density", 0.0),
+                 data.get("enemy_speed", 2.0), waves, data.get("boss_phases"))
+
+def _cache_path(name):
+    return os.path.join(CACHE_DIR, name + ".bin")
+
+def _read_cache(name, stamp):
+    try:
+        with open(_cache_path(name), "rb") as file:
+            version, cached_stamp, record = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != CACHE_VERSION or cached_stamp != stamp:
+        return None
+    return Level.from_record(record)
+
+def _write_cache(name, stamp, level):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = _cache_path(name) + ".tmp"
+        with open(temp_path, "wb") as file:
+            marshal.dump((CACHE_VERSION, stamp, level.to_record()), file)
+        os.replace(temp_path, _cache_path(name))
+    except OSError:
+        pass
+
+def load_level(name):
+    level = _loaded.get(name)
+    if level is not None:
+        return level
+    source = os.path.join(LEVEL_DIR, name + ".json")
+    info = os.stat(source)
+    stamp = (info.st_mtime_ns, info.st_size)
+    level = _read_cache(name, stamp)
+    if level is None:
+        with open(source, "r", encoding="utf-8") as file:
+            level = parse_level(name, json.load(file))
+        _write_cache(name, stamp, level)
+    _loaded[name] = level
+    return level
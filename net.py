@@ -0,0 +1,615 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import simulation
+from levels import load_level
+from profiler import NullProfiler
+from simulation import (Simulation, TileGrid, GridTank, Boss, Barrel, BulletPool, TICK, TILE_SIZE,
+                        MOVES, COOP, VERSUS, cell_center, to_cell)
+
+HOST = "127.0.0.1"
+PORT = 7777
+RESTART_DELAY = 3.0
+MAX_WRITE_BACKLOG = 256 * 1024
+INPUT_BACKLOG = 4
+STATS_WINDOW = 600
+
+HELLO, WELCOME, LEVEL, SNAPSHOT, INPUT = range(5)
+FRAME = struct.Struct("<IB")
+WELCOME_FORMAT = struct.Struct("<BB")
+LEVEL_FORMAT = struct.Struct("<H")
+INPUT_FORMAT = struct.Struct("<IB")
+SNAPSHOT_HEADER = struct.Struct("<IIdHhIBHHHH")
+ENTITY = struct.Struct("<HBIBBHBH")
+BULLET = struct.Struct("<HHhhBb")
+EVENT = struct.Struct("<BBHH")
+
+KIND_PLAYER, KIND_ENEMY, KIND_BOSS, KIND_BARREL = range(4)
+EVENT_EXPLOSION, EVENT_SHOOT, EVENT_LIFE = range(3)
+MODES = (COOP, VERSUS)
+RESULTS = (None, "DEFEAT", "VICTORY!", "BOSS DEFEATED!")
+EFFECTS = ("barrel", "player_hit", "enemy", "boss_hit", "boss")
+INPUT_ACTIONS = (simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT, simulation.FIRE)
+DIRECTIONS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+
+def frame(kind, payload=b""):
+    return FRAME.pack(len(payload), kind) + payload
+
+async def read_frame(reader):
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return kind, await reader.readexactly(length)
+
+def actions_to_bits(actions):
+    bits = 0
+    for action in actions:
+        if action in INPUT_ACTIONS:
+            bits |= 1 << INPUT_ACTIONS.index(action)
+    return bits
+
+def bits_to_actions(bits):
+    return [action for i, action in enumerate(INPUT_ACTIONS) if bits & 1 << i]
+
+def pack_entity(entity_id, kind, entity, angle, extra, frags=0):
+    cx, cy = cell_center(*entity.cell)
+    direction = 0
+    if entity.is_moving:
+        dx = entity.target_x - cx
+        dy = entity.target_y - cy
+        if dx or dy:
+            direction = DIRECTIONS.index((int(dx > 0) - int(dx < 0), int(dy > 0) - int(dy < 0)))
+    progress = min(TILE_SIZE, int(round(abs(entity.center_x - cx) + abs(entity.center_y - cy))))
+    index = entity.cell[1] * entity.grid.cols + entity.cell[0]
+    return ENTITY.pack(entity_id, kind, index, direction, progress, int(round(angle)) % 360, extra, frags)
+
+def apply_entity(entity, grid, index, direction, progress):
+    col = index % grid.cols
+    row = index // grid.cols
+    dx, dy = DIRECTIONS[direction]
+    cx, cy = cell_center(col, row)
+    entity.center_x = cx + dx * progress
+    entity.center_y = cy + dy * progress
+    entity.target_x = cx + dx * TILE_SIZE
+    entity.target_y = cy + dy * TILE_SIZE
+    entity.is_moving = direction != 0
+    return col, row
+
+def pack_move(player, bits):
+    for action in bits_to_actions(bits):
+        if action in MOVES:
+            player.start_move(*MOVES[action])
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+class RemoteClient:
+    def __init__(self, slot, writer):
+        self.slot = slot
+        self.writer = writer
+        self.inputs = deque()
+        self.ack = 0
+        self.last_sent = {}
+        self.pending_events = []
+        self.bytes_sent = 0
+        self.level_sent = False
+
+class GameServer:
+    def __init__(self, seed=None, mode=COOP):
+        self.seed = seed
+        self.mode = mode
+        self.sim = Simulation(seed, mode=mode)
+        self.sim.setup()
+        self.clients = {}
+        self.ids = {}
+        self.next_id = 1
+        self.finished_at = None
+
+    def _free_slot(self):
+        for player in self.sim.players:
+            if player.slot not in self.clients:
+                return player.slot
+        return self.sim.add_player()
+
+    async def handle(self, reader, writer):
+        try:
+            kind, _ = await read_frame(reader)
+            if kind != HELLO:
+                return
+            client = RemoteClient(self._free_slot(), writer)
+            self.clients[client.slot] = client
+            writer.write(frame(WELCOME, WELCOME_FORMAT.pack(client.slot, MODES.index(self.mode))))
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == INPUT:
+                    client.inputs.append(INPUT_FORMAT.unpack(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for slot, client in list(self.clients.items()):
+                if client.writer is writer:
+                    del self.clients[slot]
+            writer.close()
+
+    def _entity_id(self, entity):
+        entity_id = self.ids.get(entity)
+        if entity_id is None:
+            entity_id = self.next_id
+            self.next_id = self.next_id % 0xFFFF + 1
+            self.ids[entity] = entity_id
+        return entity_id
+
+    def _records(self):
+        sim = self.sim
+        records = {}
+        for player in sim.players:
+            entity_id = self._entity_id(player)
+            records[entity_id] = pack_entity(entity_id, KIND_PLAYER, player, player.logical_angle, player.slot, player.frags)
+        for enemy in sim.enemies:
+            entity_id = self._entity_id(enemy)
+            if enemy is sim.boss:
+                records[entity_id] = pack_entity(entity_id, KIND_BOSS, enemy, enemy.logical_angle, enemy.hp)
+            else:
+                records[entity_id] = pack_entity(entity_id, KIND_ENEMY, enemy, enemy.logical_angle, 0)
+        for barrel in sim.barrels:
+            entity_id = self._entity_id(barrel)
+            records[entity_id] = pack_entity(entity_id, KIND_BARREL, barrel, 0, barrel.hp)
+        self.ids = {entity: entity_id for entity, entity_id in self.ids.items() if entity_id in records}
+        return records
+
+    def _bullets(self):
+        bullets = self.sim.bullets
+        slots = bullets.live()
+        return b"".join(
+            BULLET.pack(int(min(max(x, 0), 0xFFFF)), int(min(max(y, 0), 0xFFFF)),
+                        int(round(vx * 10)), int(round(vy * 10)), int(size), int(owner))
+            for (x, y), (vx, vy), size, owner in zip(bullets.pos[slots].tolist(),
+                                                     bullets.vel[slots].tolist(),
+                                                     bullets.size[slots].tolist(),
+                                                     bullets.owner[slots].tolist()))
+
+    def _events(self, events):
+        packed = []
+        for event in events:
+            kind = event[0]
+            if kind == "explosion":
+                packed.append(EVENT.pack(EVENT_EXPLOSION, EFFECTS.index(event[3]), int(event[1]), int(event[2])))
+            elif kind == "shoot":
+                packed.append(EVENT.pack(EVENT_SHOOT, 0, int(event[1]), int(event[2])))
+            elif kind == "life":
+                packed.append(EVENT.pack(EVENT_LIFE, 0, int(event[1]), int(event[2])))
+        return packed
+
+    def _restart(self):
+        count = len(self.sim.players)
+        self.sim = Simulation(None if self.seed is None else self.seed + 1, mode=self.mode)
+        self.seed = self.sim.seed
+        self.sim.setup()
+        for _ in range(count - 1):
+            self.sim.add_player()
+        self.ids = {}
+        self.finished_at = None
+        for client in self.clients.values():
+            client.level_sent = False
+
+    def tick(self, now):
+        sim = self.sim
+        if sim.result is not None:
+            if self.finished_at is None:
+                self.finished_at = now
+            elif now - self.finished_at > RESTART_DELAY:
+                self._restart()
+                sim = self.sim
+        inputs = []
+        for client in self.clients.values():
+            bits = 0
+            for _ in range(min(len(client.inputs), 1 + (len(client.inputs) > INPUT_BACKLOG))):
+                client.ack, merged = client.inputs.popleft()
+                bits |= merged
+            inputs.extend((client.slot, action) for action in bits_to_actions(bits))
+        events = sim.step(inputs)
+        if any(event[0] == "level" for event in events):
+            for client in self.clients.values():
+                client.level_sent = False
+        packed_events = self._events(events)
+        records = self._records()
+        bullets = self._bullets()
+        bullet_count = len(bullets) // BULLET.size
+        for client in self.clients.values():
+            self._send_snapshot(client, now, records, bullets, bullet_count, packed_events)
+
+    def _send_snapshot(self, client, now, records, bullets, bullet_count, packed_events):
+        sim = self.sim
+        writer = client.writer
+        client.pending_events.extend(packed_events)
+        if writer.transport.get_write_buffer_size() > MAX_WRITE_BACKLOG:
+            return
+        data = b""
+        if not client.level_sent:
+            data += frame(LEVEL, LEVEL_FORMAT.pack(sim.level) + sim.layout.name.encode("utf-8"))
+            client.last_sent = {}
+            client.level_sent = True
+        last = client.last_sent
+        changed = [record for entity_id, record in records.items() if last.get(entity_id) != record]
+        removed = [entity_id for entity_id in last if entity_id not in records]
+        events = client.pending_events[:0xFFFF]
+        header = SNAPSHOT_HEADER.pack(sim.tick, client.ack, now, sim.level, sim.lives, sim.score,
+                                      RESULTS.index(sim.result), len(changed), len(removed),
+                                      bullet_count, len(events))
+        payload = (header + b"".join(changed) + struct.pack(f"<{len(removed)}H", *removed) +
+                   bullets + b"".join(events))
+        data += frame(SNAPSHOT, payload)
+        writer.write(data)
+        client.bytes_sent += len(data)
+        client.last_sent = records
+        client.pending_events = []
+
+    async def run(self, host=HOST, port=PORT, duration=None, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready.set()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        next_tick = start
+        try:
+            while duration is None or loop.time() - start < duration:
+                now = time.monotonic()
+                self.tick(now)
+                next_tick += TICK
+                delay = next_tick - loop.time()
+                if delay < -TICK * 5:
+                    next_tick = loop.time()
+                await asyncio.sleep(max(0.0, delay))
+        finally:
+            server.close()
+            for client in list(self.clients.values()):
+                client.writer.close()
+
+class ClientWorld:
+    def __init__(self, send):
+        self.send = send
+        self.incoming = deque()
+        self.slot = None
+        self.mode = COOP
+        self.level = 1
+        self.lives = 3
+        self.score = 0
+        self.result = None
+        self.tick = 0
+        self.layout = None
+        self.grid = TileGrid()
+        self.player = None
+        self.players = []
+        self.enemies = []
+        self.barrels = []
+        self.boss = None
+        self.bullets = BulletPool()
+        self.events = []
+        self.profiler = NullProfiler()
+        self.mirror = {}
+        self.barrel_states = {}
+        self.own_record = None
+        self.seq = 0
+        self.pending = deque()
+        self.sent_at = {}
+        self.bytes_received = 0
+        self.display_latency = deque(maxlen=STATS_WINDOW)
+        self.input_latency = deque(maxlen=STATS_WINDOW)
+        self.corrections = 0
+
+    def setup(self):
+        pass
+
+    def feed(self, kind, payload):
+        self.bytes_received += FRAME.size + len(payload)
+        self.incoming.append((kind, payload))
+
+    def poll(self):
+        reconciled = False
+        while self.incoming:
+            kind, payload = self.incoming.popleft()
+            if kind == WELCOME:
+                self.slot, mode = WELCOME_FORMAT.unpack(payload)
+                self.mode = MODES[mode]
+            elif kind == LEVEL:
+                self._load_level(LEVEL_FORMAT.unpack_from(payload)[0],
+                                 payload[LEVEL_FORMAT.size:].decode("utf-8"))
+            elif kind == SNAPSHOT:
+                self._apply_snapshot(payload)
+                reconciled = True
+        return reconciled
+
+    def step(self, actions=()):
+        self.events.clear()
+        self.tick += 1
+        self.seq += 1
+        bits = actions_to_bits(actions)
+        self.send(frame(INPUT, INPUT_FORMAT.pack(self.seq, bits)))
+        self.pending.append((self.seq, bits))
+        self.sent_at[self.seq] = time.monotonic()
+        self.grid.changes.clear()
+        if self.player is not None and self.player.grid is self.grid:
+            pack_move(self.player, bits)
+            self.player.update()
+        if self.poll():
+            self._reconcile()
+        return self.events
+
+    def _load_level(self, level, name):
+        self.level = level
+        self.layout = load_level(name)
+        self.grid = TileGrid.from_level(self.layout)
+        self.mirror = {}
+        self.barrel_states = {}
+        self.players = [self.player] if self.player is not None else []
+        self.enemies = []
+        self.barrels = []
+        self.boss = None
+        self.bullets.clear()
+        self.own_record = None
+        self.events.append(("level",))
+
+    def _create(self, kind, extra):
+        if kind == KIND_BARREL:
+            barrel = Barrel(0, 0)
+            barrel.hp = extra
+            self.barrels.append(barrel)
+            return barrel
+        if kind == KIND_BOSS:
+            tank = Boss(0, 0)
+            self.boss = tank
+            self.enemies.append(tank)
+        elif kind == KIND_PLAYER:
+            tank = GridTank(0, 0, speed=4)
+            tank.slot = extra
+            self.players.append(tank)
+        else:
+            tank = GridTank(0, 0)
+            self.enemies.append(tank)
+        return tank
+
+    def _apply_snapshot(self, payload):
+        (tick, ack, server_time, level, lives, score, result, changed, removed, bullet_count,
+         event_count) = SNAPSHOT_HEADER.unpack_from(payload)
+        now = time.monotonic()
+        self.display_latency.append(now - server_time)
+        while self.pending and self.pending[0][0] <= ack:
+            seq = self.pending.popleft()[0]
+            sent = self.sent_at.pop(seq, None)
+            if sent is not None:
+                self.input_latency.append(now - sent)
+        self.level = level
+        self.lives = lives
+        self.score = score
+        pos = SNAPSHOT_HEADER.size
+        grid = self.grid
+        for _ in range(changed):
+            entity_id, kind, index, direction, progress, angle, extra, frags = ENTITY.unpack_from(payload, pos)
+            pos += ENTITY.size
+            if kind == KIND_PLAYER and extra == self.slot:
+                self.own_record = (index, direction, progress, angle)
+                if self.player is None:
+                    self.player = self._create(kind, extra)
+                self.player.frags = frags
+                self.mirror[entity_id] = self.player
+                continue
+            entity = self.mirror.get(entity_id)
+            if entity is None:
+                entity = self._create(kind, extra)
+                self.mirror[entity_id] = entity
+            self._place(entity, index, direction, progress, angle)
+            if kind == KIND_BARREL and entity.hp != extra:
+                entity.hp = extra
+                self.events.append(("barrel_hit", entity))
+            elif kind == KIND_BOSS:
+                entity.hp = extra
+            elif kind == KIND_PLAYER:
+                entity.frags = frags
+        for entity_id in struct.unpack_from(f"<{removed}H", payload, pos):
+            self._remove(self.mirror.pop(entity_id))
+        pos += removed * 2
+        self.bullets.clear()
+        for _ in range(bullet_count):
+            x, y, vx, vy, size, owner = BULLET.unpack_from(payload, pos)
+            pos += BULLET.size
+            self.bullets.spawn(x, y, vx / 10, vy / 10, size, owner < 0, owner)
+        for _ in range(event_count):
+            kind, effect, x, y = EVENT.unpack_from(payload, pos)
+            pos += EVENT.size
+            if kind == EVENT_EXPLOSION:
+                self.events.append(("explosion", x, y, EFFECTS[effect]))
+            elif kind == EVENT_SHOOT:
+                self.events.append(("shoot", x, y))
+            elif kind == EVENT_LIFE:
+                self.events.append(("life", x, y))
+        if RESULTS[result] != self.result:
+            self.result = RESULTS[result]
+            if self.result is not None:
+                self.events.append(("game_over", self.result))
+
+    def _place(self, entity, index, direction, progress, angle):
+        grid = self.grid
+        if isinstance(entity, Barrel):
+            self.barrel_states[entity] = (index, direction, progress, angle)
+            if entity.grid is grid:
+                grid.remove_barrel(entity)
+            col, row = apply_entity(entity, grid, index, direction, progress)
+            x, y = entity.center_x, entity.center_y
+            entity.center_x, entity.center_y = cell_center(col, row)
+            grid.add_barrel(entity)
+            entity.center_x, entity.center_y = x, y
+            if entity.is_moving:
+                grid.reserve_barrel(entity, *to_cell(entity.target_x, entity.target_y))
+                grid.moving.append(entity)
+            return
+        entity.logical_angle = angle
+        col, row = apply_entity(entity, grid, index, direction, progress)
+        if entity.grid is not grid:
+            entity.center_x, entity.center_y = cell_center(col, row)
+            grid.add_tank(entity)
+            apply_entity(entity, grid, index, direction, progress)
+        elif entity.cell != (col, row):
+            grid.move_tank(entity, col, row)
+
+    def _remove(self, entity):
+        if isinstance(entity, Barrel):
+            self.grid.remove_barrel(entity)
+            self.barrels.remove(entity)
+            del self.barrel_states[entity]
+        else:
+            self.grid.remove_tank(entity)
+            if entity in self.enemies:
+                self.enemies.remove(entity)
+            if entity in self.players:
+                self.players.remove(entity)
+            if entity is self.boss:
+                self.boss = None
+        self.events.append(("removed", entity))
+
+    def _reconcile(self):
+        player = self.player
+        if player is None or self.own_record is None:
+            return
+        predicted = (player.center_x, player.center_y)
+        for barrel in list(self.grid.moving):
+            self._place(barrel, *self.barrel_states[barrel])
+        self._place(player, *self.own_record)
+        for _, bits in self.pending:
+            pack_move(player, bits)
+            player.update()
+        if (player.center_x, player.center_y) != predicted:
+            self.corrections += 1
+
+    def report(self):
+        return (f"slot={self.slot} down={self.bytes_received} B "
+                f"display p50={percentile(self.display_latency, 50) * 1000:.1f} ms "
+                f"p95={percentile(self.display_latency, 95) * 1000:.1f} ms "
+                f"input ack p50={percentile(self.input_latency, 50) * 1000:.1f} ms "
+                f"p95={percentile(self.input_latency, 95) * 1000:.1f} ms "
+                f"corrections={self.corrections}")
+
+async def connect(world, host=HOST, port=PORT):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(frame(HELLO))
+    world.send = writer.write
+
+    async def receive():
+        try:
+            while True:
+                world.feed(*await read_frame(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    return writer, asyncio.ensure_future(receive())
+
+class NetClient:
+    def __init__(self, host=HOST, port=PORT):
+        self.world = ClientWorld(self._send)
+        self.loop = asyncio.new_event_loop()
+        self.writer = None
+        self.connected = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(host, port), daemon=True)
+        self.thread.start()
+        if not self.connected.wait(5):
+            raise ConnectionError(f"could not connect to {host}:{port}")
+
+    def _run(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        self.writer, receiver = self.loop.run_until_complete(connect(self.world, host, port))
+        self.world.send = self._send
+        self.connected.set()
+        self.loop.run_until_complete(receiver)
+
+    def _send(self, data):
+        if self.writer is not None:
+            self.loop.call_soon_threadsafe(self.writer.write, data)
+
+    def wait_ready(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.world.player is None or self.world.own_record is None:
+            if time.monotonic() > deadline:
+                raise ConnectionError("server did not send a snapshot")
+            self.world.poll()
+            time.sleep(0.01)
+        self.world._reconcile()
+
+async def run_bench(clients, seconds, mode, port):
+    server = GameServer(seed=1, mode=mode)
+    ready = asyncio.Event()
+    server_task = asyncio.ensure_future(server.run(HOST, port, duration=seconds + 1, ready=ready))
+    await ready.wait()
+    worlds = []
+    tasks = []
+    for i in range(clients):
+        world = ClientWorld(None)
+        writer, receiver = await connect(world, HOST, port)
+        worlds.append(world)
+        tasks.append((writer, receiver))
+    loop = asyncio.get_running_loop()
+    rng = random.Random(2)
+    start = loop.time()
+    next_tick = start
+    while loop.time() - start < seconds:
+        for world in worlds:
+            actions = []
+            if rng.random() < 0.15:
+                actions.append(rng.choice(INPUT_ACTIONS))
+            world.step(actions)
+        next_tick += TICK
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    elapsed = loop.time() - start
+    for world, remote in zip(worlds, sorted(server.clients.values(), key=lambda client: client.slot)):
+        print(world.report())
+        print(f"  bandwidth down {world.bytes_received / elapsed / 1024:.2f} KiB/s, "
+              f"server sent {remote.bytes_sent / elapsed / 1024:.2f} KiB/s")
+    for writer, receiver in tasks:
+        writer.close()
+        receiver.cancel()
+    server_task.cancel()
+    try:
+        await server_task
+    except asyncio.CancelledError:
+        pass
+
+def run_client(host, port):
+    import arcade
+    import Main
+    window = arcade.Window(simulation.SCREEN_WIDTH, simulation.SCREEN_HEIGHT, Main.SCREEN_TITLE)
+    Main.assets.preload(window.ctx)
+    client = NetClient(host, port)
+    client.wait_ready()
+    view = Main.GameView(sim=client.world)
+    window.show_view(view)
+    view.setup()
+    arcade.schedule(lambda delta_time: print(client.world.report()), 5)
+    arcade.run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Tancheke local network play")
+    parser.add_argument("role", choices=("server", "client", "bench"))
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", choices=MODES, default=COOP)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--clients", type=int, default=2, help="bench: number of bot clients")
+    parser.add_argument("--seconds", type=float, default=10, help="bench: run time")
+    args = parser.parse_args()
+
+    if args.role == "server":
+        print(f"Tancheke {args.mode} server on {args.host}:{args.port}")
+        asyncio.run(GameServer(args.seed, args.mode).run(args.host, args.port))
+    elif args.role == "client":
+        run_client(args.host, args.port)
+    else:
+        asyncio.run(run_bench(args.clients, args.seconds, args.mode, args.port))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
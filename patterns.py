@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+
+ATTACK_TYPES = ("fan", "ring", "spiral", "burst")
+DEFAULT_SPEED = 8.4
+DEFAULT_SIZE = 8
+DEFAULT_OFFSET = 60
+DEFAULT_SPREAD = 40
+DEFAULT_TURN = 10
+DEFAULT_SPEED_STEP = 0.8
+MAX_SPEED = 40
+MAX_SIZE = 80
+DEFAULT_PHASES = [{"below": 1.0, "interval": 1.2, "attacks": [{"type": "fan", "count": 3}]}]
+
+class Attack:
+    def __init__(self, angles, speeds, aimed, turn, every, size, offset):
+        self.cos = np.cos(angles)
+        self.sin = np.sin(angles)
+        self.speeds = speeds
+        self.aimed = aimed
+        self.turn = turn
+        self.every = every
+        self.size = size
+        self.offset = offset
+
+    def emit(self, bullets, x, y, aim, volley):
+        if volley % self.every:
+            return None
+        angle = (aim if self.aimed else 0.0) + self.turn * (volley // self.every)
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
+        dx = self.cos * cos_a - self.sin * sin_a
+        dy = self.sin * cos_a + self.cos * sin_a
+        return bullets.spawn_many(x + dx * self.offset, y + dy * self.offset,
+                                  dx * self.speeds, dy * self.speeds, self.size, True)
+
+class Phase:
+    def __init__(self, below, interval, attacks):
+        self.below = below
+        self.interval = interval
+        self.attacks = attacks
+
+def _number(data, key, default, where, minimum=None, maximum=None):
+    value = data.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"{where}: {key} must be a number, got {value!r}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{where}: {key} must be at least {minimum}, got {value!r}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{where}: {key} must be at most {maximum}, got {value!r}")
+    return value
+
+def compile_attack(data, where):
+    kind = data.get("type")
+    if kind not in ATTACK_TYPES:
+        raise ValueError(f"{where}: unknown attack type {kind!r}, expected one of {', '.join(ATTACK_TYPES)}")
+    count = int(_number(data, "count", 1, where, 1))
+    speed = _number(data, "speed", DEFAULT_SPEED, where, 0, MAX_SPEED)
+    speeds = np.full(count, float(speed))
+    turn = _number(data, "turn", DEFAULT_TURN if kind == "spiral" else 0, where)
+    if kind == "fan":
+        spread = math.radians(_number(data, "spread", DEFAULT_SPREAD, where, 0))
+        angles = np.linspace(-spread / 2, spread / 2, count) if count > 1 else np.zeros(1)
+    elif kind == "burst":
+        angles = np.zeros(count)
+        speeds += np.arange(count) * _number(data, "speed_step", DEFAULT_SPEED_STEP, where, 0)
+        if speeds[-1] > MAX_SPEED:
+            raise ValueError(f"{where}: burst reaches speed {speeds[-1]:g}, at most {MAX_SPEED} is allowed")
+    else:
+        angles = np.arange(count) * (2 * math.pi / count)
+    angles += math.radians(_number(data, "angle", 0, where))
+    aimed = data.get("aimed", kind in ("fan", "burst"))
+    if not isinstance(aimed, bool):
+        raise ValueError(f"{where}: aimed must be true or false, got {aimed!r}")
+    return Attack(angles, speeds, aimed, math.radians(turn),
+                  int(_number(data, "every", 1, where, 1)), _number(data, "size", DEFAULT_SIZE, where, 1, MAX_SIZE),
+                  _number(data, "offset", DEFAULT_OFFSET, where, 0))
+
+def compile_patterns(phases, where="boss"):
+    if not isinstance(phases, list) or not phases:
+        raise ValueError(f"{where}: boss phases must be a non-empty list")
+    compiled = []
+    for i, data in enumerate(phases):
+        phase_where = f"{where} phase {i}"
+        attacks = data.get("attacks")
+        if not isinstance(attacks, list) or not attacks:
+            raise ValueError(f"{phase_where}: attacks must be a non-empty list")
+        compiled.append(Phase(_number(data, "below", 1.0, phase_where, 0),
+                              _number(data, "interval", 1.2, phase_where, 0),
+                              [compile_attack(attack, f"{phase_where} attack {j}")
+                               for j, attack in enumerate(attacks)]))
+    compiled.sort(key=lambda phase: -phase.below)
+    return compiled
+
+def phase_for(phases, fraction):
+    chosen = phases[0]
+    for phase in phases:
+        if fraction <= phase.below:
+            chosen = phase
+    return chosen
+
+DEFAULT_PATTERNS = compile_patterns(DEFAULT_PHASES)
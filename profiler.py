@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from collections import deque
+
+HISTORY = 120
+SMOOTHING = 0.05
+LOG_ENV = "TANCHEKE_PROFILE_LOG"
+
+class NullProfiler:
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def reset_worst(self):
+        pass
+
+    def close(self):
+        pass
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, log_path=None):
+        self.sections = {}
+        self.averages = {}
+        self.counts = {}
+        self.history = deque(maxlen=HISTORY)
+        self.worst = None
+        self.frame = 0
+        self.log = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+        self._last = time.perf_counter()
+
+    def begin_frame(self):
+        self.sections = {}
+        self._last = time.perf_counter()
+
+    def resume(self):
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.sections[name] = self.sections.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def end_frame(self):
+        total = sum(self.sections.values())
+        for name, seconds in self.sections.items():
+            average = self.averages.get(name, seconds)
+            self.averages[name] = average + (seconds - average) * SMOOTHING
+        self.history.append(total)
+        if self.worst is None or total > self.worst["total"]:
+            self.worst = {"frame": self.frame, "total": total, "sections": dict(self.sections)}
+        if self.log is not None:
+            self.log.write(json.dumps({
+                "frame": self.frame,
+                "total_ms": total * 1000,
+                "sections_ms": {name: seconds * 1000 for name, seconds in self.sections.items()},
+                "counts": self.counts,
+            }) + "\n")
+        self.frame += 1
+
+    def reset_worst(self):
+        self.worst = None
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+def make_profiler():
+    log_path = os.environ.get(LOG_ENV)
+    if log_path:
+        return FrameProfiler(log_path)
+    return NullProfiler()
+
+class StartupTimer:
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = {}
+
+    def mark(self, name):
+        if name in self.stages:
+            return False
+        self.stages[name] = time.perf_counter() - self.started
+        return True
+
+    def report(self):
+        return "startup: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.stages.items())
+
+    def save(self):
+        log_path = os.environ.get(LOG_ENV)
+        if log_path:
+            with open(log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"startup_ms": {name: seconds * 1000
+                                                      for name, seconds in self.stages.items()}}) + "\n")
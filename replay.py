@@ -0,0 +1,149 @@
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+import simulation
+from simulation import Simulation
+
+REPLAY_DIR = "replays"
+REPLAY_EXTENSION = ".tnkr"
+REPLAY_MAGIC = b"TNKR"
+REPLAY_VERSION = 2
+HEADER = struct.Struct("<4sBqHII")
+
+ZOOM = "zoom"
+MENU = "menu"
+ACTIONS = (simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT,
+           simulation.FIRE, simulation.RESTART, simulation.SECRET, ZOOM, MENU)
+CODES = {action: code for code, action in enumerate(ACTIONS)}
+CODE_BITS = 4
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class Replay:
+    def __init__(self, seed, level=1, events=None, end_tick=0):
+        self.seed = seed
+        self.level = level
+        self.events = events if events is not None else []
+        self.end_tick = end_tick
+
+    def record(self, tick, action):
+        self.events.append((tick, action))
+
+    def finish(self, tick):
+        self.end_tick = tick
+
+    def by_tick(self):
+        ticks = {}
+        for tick, action in self.events:
+            ticks.setdefault(tick, []).append(action)
+        return ticks
+
+    def encode(self):
+        body = bytearray()
+        last_tick = 0
+        for tick, action in self.events:
+            _write_varint(body, (tick - last_tick) << CODE_BITS | CODES[action])
+            last_tick = tick
+        return HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.level,
+                           self.end_tick, len(self.events)) + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("replay file is truncated")
+        magic, version, seed, level, end_tick, count = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("not a Tancheke replay file")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"unsupported replay version {version}, expected {REPLAY_VERSION}")
+        events = []
+        tick = 0
+        pos = 0
+        try:
+            body = zlib.decompress(data[HEADER.size:])
+            for _ in range(count):
+                value, pos = _read_varint(body, pos)
+                tick += value >> CODE_BITS
+                events.append((tick, ACTIONS[value & (1 << CODE_BITS) - 1]))
+        except (zlib.error, IndexError) as error:
+            raise ValueError(f"replay file is corrupted: {error}") from error
+        return cls(seed, level, events, end_tick)
+
+    def save(self, path=None):
+        if path is None:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.seed & 0xFFFFFFFF:08x}"
+            path = os.path.join(REPLAY_DIR, name + REPLAY_EXTENSION)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(self.encode())
+        os.replace(temp_path, path)
+        return path
+
+def load_replay(path):
+    with open(path, "rb") as file:
+        return Replay.decode(file.read())
+
+def play_headless(replay):
+    sim = Simulation(replay.seed, replay.level)
+    sim.setup()
+    ticks = replay.by_tick()
+    while sim.tick < replay.end_tick and sim.result is None:
+        actions = ticks.get(sim.tick + 1, ())
+        if MENU in actions:
+            break
+        sim.step([action for action in actions if action != ZOOM])
+    return sim
+
+def main():
+    parser = argparse.ArgumentParser(description="Tancheke replay player")
+    parser.add_argument("path")
+    parser.add_argument("--realtime", action="store_true",
+                        help="play back in a game window instead of fast-forwarding headless")
+    args = parser.parse_args()
+    try:
+        replay = load_replay(args.path)
+    except (OSError, ValueError) as error:
+        print(f"cannot load replay {args.path}: {error}", file=sys.stderr)
+        return 1
+
+    if args.realtime:
+        import arcade
+        import Main
+        window = arcade.Window(simulation.SCREEN_WIDTH, simulation.SCREEN_HEIGHT, Main.SCREEN_TITLE)
+        Main.assets.preload(window.ctx)
+        view = Main.GameView(replay=replay)
+        window.show_view(view)
+        view.setup()
+        arcade.run()
+        return 0
+
+    start = time.perf_counter()
+    sim = play_headless(replay)
+    elapsed = time.perf_counter() - start
+    print(f"seed={replay.seed} events={len(replay.events)} ticks={sim.tick}/{replay.end_tick} "
+          f"level={sim.level} score={sim.score} lives={sim.lives} result={sim.result}")
+    print(f"{sim.tick / elapsed if elapsed else 0:.0f} ticks/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import marshal
+import os
+import struct
+import zlib
+
+SAVE_DIR = "saves"
+SAVE_EXTENSION = ".tnks"
+SAVE_MAGIC = b"TNKS"
+SAVE_VERSION = 2
+QUICK_SLOTS = 3
+HEADER = struct.Struct("<4sBHIi")
+
+class SaveGame:
+    def __init__(self, state, start_state, level, tick, score):
+        self.state = state
+        self.start_state = start_state
+        self.level = level
+        self.tick = tick
+        self.score = score
+
+    @classmethod
+    def capture(cls, sim):
+        return cls(sim.snapshot(), sim.start_state, sim.level, sim.tick, sim.score)
+
+    def apply(self, sim):
+        sim.check_state(self.start_state)
+        sim.restore(self.state)
+        sim.start_state = self.start_state
+
+    def encode(self):
+        body = marshal.dumps((self.state, self.start_state))
+        return HEADER.pack(SAVE_MAGIC, SAVE_VERSION, self.level, self.tick, self.score) + zlib.compress(body, 9)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("save file is truncated")
+        magic, version, level, tick, score = HEADER.unpack_from(data)
+        if magic != SAVE_MAGIC:
+            raise ValueError("not a Tancheke save file")
+        if version != SAVE_VERSION:
+            raise ValueError(f"unsupported save version {version}, expected {SAVE_VERSION}")
+        try:
+            state, start_state = marshal.loads(zlib.decompress(data[HEADER.size:]))
+        except (zlib.error, EOFError, TypeError, ValueError) as error:
+            raise ValueError(f"save file is corrupted: {error}") from error
+        return cls(state, start_state, level, tick, score)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(self.encode())
+        os.replace(temp_path, path)
+        return path
+
+def slot_path(slot, directory=SAVE_DIR):
+    return os.path.join(directory, f"quick{slot}{SAVE_EXTENSION}")
+
+def load_save(path):
+    with open(path, "rb") as file:
+        return SaveGame.decode(file.read())
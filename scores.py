@@ -0,0 +1,140 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+SCORE_FILE = "scores.json"
+LEGACY_FILE = "record.txt"
+SCORES_VERSION = 1
+TOP_SIZE = 10
+FLUSH_TIMEOUT = 2.0
+
+class ScoreStore:
+    def __init__(self, path=SCORE_FILE, legacy_path=LEGACY_FILE, top_size=TOP_SIZE):
+        self.path = path
+        self.top_size = top_size
+        self.top = []
+        self.levels = {}
+        self.error = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.saved_version = 0
+        self.closing = False
+        self.thread = None
+        self._load(legacy_path)
+
+    def _load(self, legacy_path):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == SCORES_VERSION:
+                self.top = data["top"][:self.top_size]
+                self.levels = data["levels"]
+            else:
+                self._move_aside(f".v{data.get('version')}.bak")
+            return
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as error:
+            self.error = error
+            self._move_aside(".bak")
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as file:
+                content = file.read().strip()
+            if content:
+                self.top = [{"score": int(content), "level": None, "result": None, "date": None}]
+        except (OSError, ValueError):
+            pass
+
+    def _move_aside(self, suffix):
+        try:
+            os.replace(self.path, self.path + suffix)
+        except OSError as error:
+            self.error = error
+
+    def high_score(self):
+        return self.top[0]["score"] if self.top else 0
+
+    def submit(self, score, level, result):
+        entry = {"score": score, "level": level, "result": result, "date": time.strftime("%Y-%m-%d %H:%M")}
+        with self.lock:
+            top = self.top
+            position = next((i for i, other in enumerate(top) if score > other["score"]), len(top))
+            if position >= self.top_size:
+                return None
+            top.insert(position, entry)
+            del top[self.top_size:]
+            self._changed()
+        return position
+
+    def record_level(self, level, seconds, kills, barrels, cleared):
+        with self.lock:
+            stats = self.levels.setdefault(str(level), {
+                "plays": 0, "clears": 0, "best_time": None, "total_time": 0.0, "kills": 0, "barrels": 0,
+            })
+            stats["plays"] += 1
+            stats["total_time"] += seconds
+            stats["kills"] += kills
+            stats["barrels"] += barrels
+            if cleared:
+                stats["clears"] += 1
+                if stats["best_time"] is None or seconds < stats["best_time"]:
+                    stats["best_time"] = seconds
+            self._changed()
+
+    def level_stats(self, level):
+        return self.levels.get(str(level))
+
+    def reset(self):
+        with self.lock:
+            self.top = []
+            self.levels = {}
+            self._changed()
+
+    def _changed(self):
+        self.version += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._writer, name="score-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        self.changed.notify_all()
+
+    def _writer(self):
+        while True:
+            with self.lock:
+                while self.version == self.saved_version and not self.closing:
+                    self.changed.wait()
+                if self.version == self.saved_version:
+                    return
+                version = self.version
+                data = json.dumps({"version": SCORES_VERSION, "top": self.top, "levels": self.levels},
+                                  ensure_ascii=False, indent=1)
+            try:
+                self._write(data)
+                self.error = None
+            except OSError as error:
+                self.error = error
+                with self.lock:
+                    self.changed.wait(1.0)
+                continue
+            with self.lock:
+                self.saved_version = version
+                self.changed.notify_all()
+
+    def _write(self, data):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+            self.changed.notify_all()
+        if self.thread is not None:
+            self.thread.join(FLUSH_TIMEOUT)
@@ -0,0 +1,1104 @@
+import math
+import random
+from collections import deque
+import numpy as np
+from levels import load_level
+from patterns import DEFAULT_PATTERNS, phase_for
+from profiler import NullProfiler
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+TILE_SIZE = 40
+BULLET_SPEED = 7
+SHOOT_COOLDOWN = 1.3
+LIFE_DROP_CHANCE = 0.3
+RESPAWN_GRACE = 120
+BOSS_HP = 10
+MAX_LEVELS = 3
+SECRET_LEVEL = 999
+ENDLESS_LEVEL = 1000
+GRID_COLS = SCREEN_WIDTH // TILE_SIZE
+GRID_ROWS = SCREEN_HEIGHT // TILE_SIZE
+BULLET_CAPACITY = 4096
+TICK = 1 / 60
+AI_CHASE_CHANCE = 0.75
+AI_BUDGET = 32
+AI_NEAR_DISTANCE = 12
+AI_FAR_INTERVAL = 15
+ENDLESS_FIRST_WAVE = 6
+ENDLESS_WAVE_GROWTH = 1.3
+ENDLESS_NEXT_WAVE = 0.25
+ENDLESS_SPAWN_INTERVAL = 20
+ENDLESS_WAVE_TICKS = 40 * 60
+UNREACHABLE = 1 << 30
+CHUNK_SIZE = 16
+ACTIVE_RADIUS = 1
+
+UP = "up"
+DOWN = "down"
+LEFT = "left"
+RIGHT = "right"
+FIRE = "fire"
+RESTART = "restart"
+SECRET = "secret"
+
+COOP = "coop"
+VERSUS = "versus"
+
+MOVES = {
+    UP: (0, 1, 90),
+    DOWN: (0, -1, 270),
+    LEFT: (-1, 0, 0),
+    RIGHT: (1, 0, 180),
+}
+AI_MOVES = [(1, 0, 180), (-1, 0, 0), (0, 1, 90), (0, -1, 270)]
+
+def to_cell(x, y):
+    return int(x // TILE_SIZE), int(y // TILE_SIZE)
+
+def cell_center(col, row):
+    return col * TILE_SIZE + TILE_SIZE // 2, row * TILE_SIZE + TILE_SIZE // 2
+
+class TileGrid:
+    def __init__(self, cols=GRID_COLS, rows=GRID_ROWS):
+        self.cols = cols
+        self.rows = rows
+        self.walls = bytearray(cols * rows)
+        self.occupied = bytearray(cols * rows)
+        self.barrels = [None] * (cols * rows)
+        self.tanks = [[] for _ in range(cols * rows)]
+        self.changes = []
+        self.moving = []
+        self.chunk_cols = -(-cols // CHUNK_SIZE)
+        self.chunk_rows = -(-rows // CHUNK_SIZE)
+        self.chunk_tanks = [[] for _ in range(self.chunk_cols * self.chunk_rows)]
+        self.chunk_barrels = [[] for _ in range(self.chunk_cols * self.chunk_rows)]
+
+    @classmethod
+    def from_level(cls, level):
+        grid = cls(level.cols, level.rows)
+        grid.walls[:] = level.walls
+        return grid
+
+    def index(self, col, row):
+        return row * self.cols + col
+
+    def in_bounds(self, col, row):
+        return 0 <= col < self.cols and 0 <= row < self.rows
+
+    def is_wall(self, col, row):
+        return self.walls[self.index(col, row)] == 1
+
+    def barrel_at(self, col, row):
+        return self.barrels[self.index(col, row)]
+
+    def tanks_at(self, col, row):
+        return self.tanks[self.index(col, row)]
+
+    def is_open(self, col, row):
+        if not self.in_bounds(col, row):
+            return False
+        i = self.index(col, row)
+        return not self.walls[i] and self.barrels[i] is None
+
+    def is_passable(self, i):
+        return not self.walls[i] and not self.occupied[i]
+
+    def bounds(self):
+        return 0, 0, self.cols - 1, self.rows - 1
+
+    def within(self, i, bounds):
+        col = i % self.cols
+        row = i // self.cols
+        return bounds[0] <= col <= bounds[2] and bounds[1] <= row <= bounds[3]
+
+    def neighbors(self, i, bounds=None):
+        min_col, min_row, max_col, max_row = bounds or self.bounds()
+        col = i % self.cols
+        row = i // self.cols
+        if col > min_col:
+            yield i - 1
+        if col < max_col:
+            yield i + 1
+        if row > min_row:
+            yield i - self.cols
+        if row < max_row:
+            yield i + self.cols
+
+    def chunk_of(self, col, row):
+        return (row // CHUNK_SIZE) * self.chunk_cols + col // CHUNK_SIZE
+
+    def chunks_in(self, min_col, min_row, max_col, max_row):
+        first_col = max(0, min_col // CHUNK_SIZE)
+        last_col = min(self.chunk_cols - 1, max_col // CHUNK_SIZE)
+        first_row = max(0, min_row // CHUNK_SIZE)
+        last_row = min(self.chunk_rows - 1, max_row // CHUNK_SIZE)
+        return [row * self.chunk_cols + col
+                for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
+
+    def chunk_bounds(self, chunk):
+        col = chunk % self.chunk_cols * CHUNK_SIZE
+        row = chunk // self.chunk_cols * CHUNK_SIZE
+        return (col, row, min(col + CHUNK_SIZE, self.cols) - 1,
+                min(row + CHUNK_SIZE, self.rows) - 1)
+
+    def active_bounds(self, col, row):
+        chunk_col = col // CHUNK_SIZE
+        chunk_row = row // CHUNK_SIZE
+        return (max(0, (chunk_col - ACTIVE_RADIUS) * CHUNK_SIZE),
+                max(0, (chunk_row - ACTIVE_RADIUS) * CHUNK_SIZE),
+                min(self.cols, (chunk_col + ACTIVE_RADIUS + 1) * CHUNK_SIZE) - 1,
+                min(self.rows, (chunk_row + ACTIVE_RADIUS + 1) * CHUNK_SIZE) - 1)
+
+    def add_barrel(self, barrel):
+        barrel.grid = self
+        barrel.cell = to_cell(barrel.center_x, barrel.center_y)
+        self.chunk_barrels[self.chunk_of(*barrel.cell)].append(barrel)
+        self.reserve_barrel(barrel, *barrel.cell)
+
+    def reserve_barrel(self, barrel, col, row):
+        i = self.index(col, row)
+        self.barrels[i] = barrel
+        self.occupied[i] = 1
+        self.changes.append(i)
+
+    def settle_barrel(self, barrel, col, row):
+        i = self.index(*barrel.cell)
+        if self.barrels[i] is barrel:
+            self.barrels[i] = None
+            self.occupied[i] = 0
+            self.changes.append(i)
+        old_chunk = self.chunk_of(*barrel.cell)
+        new_chunk = self.chunk_of(col, row)
+        if old_chunk != new_chunk:
+            self.chunk_barrels[old_chunk].remove(barrel)
+            self.chunk_barrels[new_chunk].append(barrel)
+        barrel.cell = (col, row)
+        self.reserve_barrel(barrel, col, row)
+
+    def remove_barrel(self, barrel):
+        self.chunk_barrels[self.chunk_of(*barrel.cell)].remove(barrel)
+        if barrel.is_moving:
+            self.moving.remove(barrel)
+        for i in (self.index(*barrel.cell), self.index(*to_cell(barrel.target_x, barrel.target_y))):
+            if self.barrels[i] is barrel:
+                self.barrels[i] = None
+                self.occupied[i] = 0
+                self.changes.append(i)
+
+    def add_tank(self, tank):
+        tank.grid = self
+        tank.cell = to_cell(tank.center_x, tank.center_y)
+        self.tanks[self.index(*tank.cell)].append(tank)
+        self.chunk_tanks[self.chunk_of(*tank.cell)].append(tank)
+
+    def move_tank(self, tank, col, row):
+        self.tanks[self.index(*tank.cell)].remove(tank)
+        old_chunk = self.chunk_of(*tank.cell)
+        new_chunk = self.chunk_of(col, row)
+        if old_chunk != new_chunk:
+            self.chunk_tanks[old_chunk].remove(tank)
+            self.chunk_tanks[new_chunk].append(tank)
+        tank.cell = (col, row)
+        self.tanks[self.index(col, row)].append(tank)
+
+    def remove_tank(self, tank):
+        self.tanks[self.index(*tank.cell)].remove(tank)
+        self.chunk_tanks[self.chunk_of(*tank.cell)].remove(tank)
+
+    def tanks_in(self, bounds):
+        return [tank for chunk in self.chunks_in(*bounds) for tank in self.chunk_tanks[chunk]]
+
+    def cell_indices(self, xs, ys, bounds=None):
+        min_col, min_row, max_col, max_row = bounds or self.bounds()
+        cols = np.floor_divide(xs, TILE_SIZE).astype(np.intp)
+        rows = np.floor_divide(ys, TILE_SIZE).astype(np.intp)
+        inside = (cols >= min_col) & (cols <= max_col) & (rows >= min_row) & (rows <= max_row)
+        return rows * self.cols + cols, inside
+
+    def wall_mask(self):
+        return np.frombuffer(self.walls, dtype=np.uint8)
+
+    def barrel_mask(self):
+        return np.frombuffer(self.occupied, dtype=np.uint8)
+
+class FlowField:
+    def __init__(self, grid):
+        self.grid = grid
+        self.target = None
+        self.bounds = grid.bounds()
+        self.filled = None
+        self.stale = True
+        self.dist = [UNREACHABLE] * (grid.cols * grid.rows)
+
+    def _reset(self, bounds):
+        min_col, min_row, max_col, max_row = bounds
+        cols = self.grid.cols
+        blank = [UNREACHABLE] * (max_col - min_col + 1)
+        for row in range(min_row, max_row + 1):
+            self.dist[row * cols + min_col:row * cols + max_col + 1] = blank
+
+    def rebuild(self):
+        grid = self.grid
+        bounds = self.bounds
+        if self.filled is not None:
+            self._reset(self.filled)
+        self._reset(bounds)
+        self.filled = bounds
+        dist = self.dist
+        for target in self.target:
+            dist[target] = 0
+        queue = deque(self.target)
+        while queue:
+            i = queue.popleft()
+            step = dist[i] + 1
+            for n in grid.neighbors(i, bounds):
+                if dist[n] > step and grid.is_passable(n):
+                    dist[n] = step
+                    queue.append(n)
+        self.stale = False
+
+    def update(self, target, changes, bounds):
+        if target != self.target or bounds != self.bounds or self.stale:
+            self.target = target
+            self.bounds = bounds
+            self.stale = True
+            return
+        grid = self.grid
+        dist = self.dist
+        queue = deque()
+        for i in changes:
+            if not grid.within(i, bounds):
+                continue
+            if not grid.is_passable(i):
+                if dist[i] != UNREACHABLE:
+                    self.stale = True
+                    return
+            else:
+                best = min(dist[n] for n in grid.neighbors(i, bounds)) + 1
+                if best < dist[i]:
+                    dist[i] = best
+                    queue.append(i)
+        while queue:
+            i = queue.popleft()
+            step = dist[i] + 1
+            for n in grid.neighbors(i, bounds):
+                if dist[n] > step and grid.is_passable(n):
+                    dist[n] = step
+                    queue.append(n)
+
+    def next_step(self, i):
+        if self.stale:
+            self.rebuild()
+        best = self.dist[i]
+        choice = None
+        for n in self.grid.neighbors(i, self.bounds):
+            if self.dist[n] < best:
+                best = self.dist[n]
+                choice = n
+        if choice is None:
+            return None
+        return direction_to(self.grid, i, choice)
+
+class SightTable:
+    def __init__(self, grid):
+        self.grid = grid
+        self.row_span = [-1] * (grid.cols * grid.rows)
+        self.col_span = [-1] * (grid.cols * grid.rows)
+        for row in range(grid.rows):
+            self._scan_row(row)
+        for col in range(grid.cols):
+            self._scan_col(col)
+
+    def _scan_row(self, row):
+        grid = self.grid
+        span = -1
+        for i in range(row * grid.cols, (row + 1) * grid.cols):
+            if grid.is_passable(i):
+                if span == -1:
+                    span = i
+                self.row_span[i] = span
+            else:
+                span = -1
+                self.row_span[i] = -1
+
+    def _scan_col(self, col):
+        grid = self.grid
+        span = -1
+        for i in range(col, grid.cols * grid.rows, grid.cols):
+            if grid.is_passable(i):
+                if span == -1:
+                    span = i
+                self.col_span[i] = span
+            else:
+                span = -1
+                self.col_span[i] = -1
+
+    def update(self, changes):
+        for row in {i // self.grid.cols for i in changes}:
+            self._scan_row(row)
+        for col in {i % self.grid.cols for i in changes}:
+            self._scan_col(col)
+
+    def can_see(self, a, b):
+        span = self.row_span[a]
+        if span != -1 and span == self.row_span[b]:
+            return True
+        span = self.col_span[a]
+        return span != -1 and span == self.col_span[b]
+
+def direction_to(grid, source, target):
+    dx = target % grid.cols - source % grid.cols
+    dy = target // grid.cols - source // grid.cols
+    if abs(dx) >= abs(dy):
+        return AI_MOVES[0] if dx > 0 else AI_MOVES[1]
+    return AI_MOVES[2] if dy > 0 else AI_MOVES[3]
+
+class BulletPool:
+    def __init__(self, capacity=BULLET_CAPACITY):
+        self.capacity = capacity
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.is_enemy = np.zeros(capacity, dtype=bool)
+        self.owner = np.full(capacity, -1, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def clear(self):
+        self.alive[:] = False
+        self.vel[:] = 0
+
+    def spawn(self, x, y, change_x, change_y, size, is_enemy, owner=-1):
+        i = int(np.argmin(self.alive))
+        if self.alive[i]:
+            return -1
+        self.pos[i] = x, y
+        self.vel[i] = change_x, change_y
+        self.size[i] = size
+        self.is_enemy[i] = is_enemy
+        self.owner[i] = owner
+        self.alive[i] = True
+        return i
+
+    def spawn_many(self, xs, ys, change_xs, change_ys, size, is_enemy):
+        slots = np.flatnonzero(~self.alive)[:len(xs)]
+        count = len(slots)
+        self.pos[slots, 0] = xs[:count]
+        self.pos[slots, 1] = ys[:count]
+        self.vel[slots, 0] = change_xs[:count]
+        self.vel[slots, 1] = change_ys[:count]
+        self.size[slots] = size
+        self.is_enemy[slots] = is_enemy
+        self.owner[slots] = -1
+        self.alive[slots] = True
+        return slots
+
+    def kill(self, slots):
+        self.alive[slots] = False
+        self.vel[slots] = 0
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+    def update(self):
+        self.pos += self.vel
+
+class GridMover:
+    __slots__ = ("center_x", "center_y", "target_x", "target_y", "is_moving", "move_speed", "grid", "cell")
+
+    def __init__(self, x, y, speed):
+        self.center_x = x
+        self.center_y = y
+        self.target_x = x
+        self.target_y = y
+        self.is_moving = False
+        self.move_speed = speed
+        self.grid = None
+        self.cell = to_cell(x, y)
+
+    def advance(self):
+        if self.center_x < self.target_x:
+            self.center_x += self.move_speed
+        elif self.center_x > self.target_x:
+            self.center_x -= self.move_speed
+        elif self.center_y < self.target_y:
+            self.center_y += self.move_speed
+        elif self.center_y > self.target_y:
+            self.center_y -= self.move_speed
+        if (abs(self.center_x - self.target_x) < 4 and
+                abs(self.center_y - self.target_y) < 4):
+            self.center_x = self.target_x
+            self.center_y = self.target_y
+            self.is_moving = False
+            return True
+        return False
+
+class Barrel(GridMover):
+    __slots__ = ("hp",)
+
+    def __init__(self, x, y):
+        super().__init__(x, y, 4)
+        self.hp = 3
+
+    def update(self):
+        if self.is_moving and self.advance():
+            self.grid.settle_barrel(self, *to_cell(self.target_x, self.target_y))
+
+    def push(self, dx, dy):
+        if self.is_moving:
+            return False
+        col = self.cell[0] + dx
+        row = self.cell[1] + dy
+        if not self.grid.is_open(col, row):
+            return False
+        self.grid.reserve_barrel(self, col, row)
+        self.grid.moving.append(self)
+        self.target_x, self.target_y = cell_center(col, row)
+        self.is_moving = True
+        return True
+
+    def take_damage(self):
+        self.hp -= 1
+        return self.hp <= 0
+
+class GridTank(GridMover):
+    __slots__ = ("half_size", "logical_angle", "shoot_timer", "think_tick", "safe_until", "slot", "start", "frags")
+
+    def __init__(self, x, y, speed=4, half_size=TILE_SIZE * 0.75):
+        super().__init__(x, y, speed)
+        self.half_size = half_size
+        self.logical_angle = -90
+        self.shoot_timer = 0
+        self.think_tick = 0
+        self.safe_until = 0
+        self.slot = -1
+        self.start = None
+        self.frags = 0
+
+    def update(self):
+        if self.is_moving and self.advance():
+            self.grid.move_tank(self, *to_cell(self.target_x, self.target_y))
+
+    def start_move(self, dx, dy, logical_angle):
+        self.logical_angle = logical_angle
+        if self.is_moving:
+            return
+        col = self.cell[0] + dx
+        row = self.cell[1] + dy
+        if not self.grid.in_bounds(col, row) or self.grid.is_wall(col, row):
+            return
+        barrel = self.grid.barrel_at(col, row)
+        if barrel is not None and not barrel.push(dx, dy):
+            return
+        self.target_x, self.target_y = cell_center(col, row)
+        self.is_moving = True
+
+class Boss(GridTank):
+    __slots__ = ("hp", "max_hp", "patterns", "volley")
+
+    def __init__(self, x, y, hp=BOSS_HP, patterns=DEFAULT_PATTERNS):
+        super().__init__(x, y, speed=0, half_size=TILE_SIZE)
+        self.hp = hp
+        self.max_hp = hp
+        self.patterns = patterns
+        self.volley = 0
+        self.logical_angle = 0
+
+    def update_aim(self, player_x, player_y):
+        dx = player_x - self.center_x
+        dy = player_y - self.center_y
+        self.logical_angle = math.degrees(math.atan2(dy, dx))
+
+    def take_damage(self):
+        self.hp -= 1
+        return self.hp <= 0
+
+    def phase(self):
+        return phase_for(self.patterns, self.hp / self.max_hp)
+
+    def shoot(self, bullets):
+        aim = math.radians(self.logical_angle)
+        for attack in self.phase().attacks:
+            attack.emit(bullets, self.center_x, self.center_y, aim, self.volley)
+        self.volley += 1
+
+class AIScheduler:
+    def __init__(self, budget=AI_BUDGET, near=AI_NEAR_DISTANCE, far_interval=AI_FAR_INTERVAL):
+        self.budget = budget
+        self.near = near
+        self.far_interval = far_interval
+        self.cursor = 0
+        self.deferred = 0
+
+    def select(self, idle, player_cells, cols, tick):
+        if len(idle) <= self.budget:
+            self.deferred = 0
+            return idle
+        players = [(i % cols, i // cols) for i in player_cells]
+        limit = self.near
+        due = tick - self.far_interval
+        near = []
+        far = []
+        for enemy in idle:
+            col, row = enemy.cell
+            distance = UNREACHABLE
+            for player_col, player_row in players:
+                d = abs(col - player_col) + abs(row - player_row)
+                if d < distance:
+                    distance = d
+            if distance <= limit:
+                near.append((distance, enemy))
+            elif enemy.think_tick <= due:
+                far.append(enemy)
+        if len(near) > self.budget:
+            near.sort(key=lambda item: item[0])
+        chosen = [enemy for _, enemy in near[:self.budget]]
+        room = self.budget - len(chosen)
+        if room > 0 and far:
+            start = self.cursor % len(far)
+            picked = (far[start:] + far[:start])[:room]
+            self.cursor = start + len(picked)
+            chosen.extend(picked)
+        self.deferred = len(idle) - len(chosen)
+        return chosen
+
+class Simulation:
+    def __init__(self, seed=None, level=1, shoot_cooldown=SHOOT_COOLDOWN, enemy_speed_scale=1.0,
+                 barrel_scale=1.0, life_drop_chance=LIFE_DROP_CHANCE, boss_hp=BOSS_HP, mode=COOP):
+        if seed is None:
+            seed = random.randrange(1 << 63)
+        self.seed = seed
+        self.shoot_cooldown = shoot_cooldown
+        self.enemy_speed_scale = enemy_speed_scale
+        self.barrel_scale = barrel_scale
+        self.life_drop_chance = life_drop_chance
+        self.boss_hp = boss_hp
+        self.mode = mode
+        self.rng = random.Random(seed)
+        self.level = level
+        self.lives = 3
+        self.score = 0
+        self.tick = 0
+        self.result = None
+        self.layout = None
+        self.grid = TileGrid()
+        self.wave = 0
+        self.wave_size = 0
+        self.wave_tick = 0
+        self.spawn_queue = 0
+        self.scheduler = AIScheduler()
+        self.level_tick = 0
+        self.kills = 0
+        self.barrels_destroyed = 0
+        self.player = None
+        self.players = []
+        self.boss = None
+        self.enemies = []
+        self.barrels = []
+        self.bullets = BulletPool()
+        self.flow = FlowField(self.grid)
+        self.sight = SightTable(self.grid)
+        self.events = []
+        self.start_state = None
+        self.profiler = NullProfiler()
+
+    def _reset_world(self, layout):
+        self.layout = layout
+        self.grid = TileGrid.from_level(layout)
+        self.wave = 0
+        self.wave_size = 0
+        self.wave_tick = self.tick
+        self.spawn_queue = 0
+        self.level_tick = self.tick
+        self.kills = 0
+        self.barrels_destroyed = 0
+        self.enemies = []
+        self.barrels = []
+        self.boss = None
+        self.bullets.clear()
+        frags = [player.frags for player in self.players] or [0]
+        self.players = []
+        for count in frags:
+            self.players[self.add_player()].frags = count
+        self.player = self.players[0]
+        self.events.append(("level",))
+
+    def add_player(self):
+        start = self._free_start()
+        player = GridTank(*cell_center(*start), speed=4)
+        player.slot = len(self.players)
+        player.start = start
+        self.players.append(player)
+        self.grid.add_tank(player)
+        self.events.append(("spawned", player))
+        return player.slot
+
+    def _free_start(self):
+        grid = self.grid
+        first = grid.index(*self.layout.player)
+        seen = {first}
+        queue = deque([first])
+        while queue:
+            i = queue.popleft()
+            if not grid.tanks[i]:
+                return i % grid.cols, i // grid.cols
+            for n in grid.neighbors(i):
+                if n not in seen and grid.is_passable(n):
+                    seen.add(n)
+                    queue.append(n)
+        return self.layout.player
+
+    def add_barrel(self, x, y):
+        barrel = Barrel(x, y)
+        self.barrels.append(barrel)
+        self.grid.add_barrel(barrel)
+        self.events.append(("spawned", barrel))
+        return barrel
+
+    def add_enemy(self, enemy):
+        self.enemies.append(enemy)
+        self.grid.add_tank(enemy)
+        self.events.append(("spawned", enemy))
+        return enemy
+
+    def _place_barrels(self):
+        cols = self.grid.cols
+        count = min(round(self.layout.barrel_count() * self.barrel_scale), len(self.layout.barrel_cells))
+        for i in self.rng.sample(self.layout.barrel_cells, count):
+            self.add_barrel(*cell_center(i % cols, i // cols))
+
+    def _spawn_enemy(self, col, row):
+        enemy = GridTank(*cell_center(col, row), speed=self.layout.enemy_speed * self.enemy_speed_scale)
+        enemy.logical_angle = 270
+        enemy.think_tick = self.tick
+        return self.add_enemy(enemy)
+
+    def _spawn_wave(self):
+        spawns = self.layout.enemy_spawns
+        for i in range(self.layout.waves[self.wave]):
+            self._spawn_enemy(*spawns[i % len(spawns)])
+        self.wave += 1
+
+    def _endless_waves(self):
+        if not self.spawn_queue and (len(self.enemies) <= self.wave_size * ENDLESS_NEXT_WAVE or
+                                     self.tick - self.wave_tick >= ENDLESS_WAVE_TICKS):
+            self.wave += 1
+            self.wave_tick = self.tick
+            self.wave_size = round(ENDLESS_FIRST_WAVE * ENDLESS_WAVE_GROWTH ** (self.wave - 1))
+            self.spawn_queue = self.wave_size
+            self.events.append(("wave", self.wave))
+        if self.spawn_queue and self.tick % ENDLESS_SPAWN_INTERVAL == 0:
+            grid = self.grid
+            for col, row in self.layout.enemy_spawns:
+                if not self.spawn_queue:
+                    break
+                if not grid.tanks[grid.index(col, row)]:
+                    self._spawn_enemy(col, row)
+                    self.spawn_queue -= 1
+
+    def setup(self):
+        if self.level == SECRET_LEVEL:
+            self.setup_secret_level()
+            return
+        if self.level == ENDLESS_LEVEL:
+            self.setup_endless()
+            return
+        self._reset_world(load_level(f"level{self.level}"))
+        self._place_barrels()
+        if self.layout.waves:
+            self._spawn_wave()
+        self.start_state = self.snapshot()
+
+    def setup_endless(self):
+        self.level = ENDLESS_LEVEL
+        self._reset_world(load_level("endless"))
+        self._place_barrels()
+        self.start_state = self.snapshot()
+
+    def setup_secret_level(self):
+        self.level = SECRET_LEVEL
+        self._reset_world(load_level("secret"))
+        self.boss = Boss(*cell_center(*self.layout.boss), hp=self.boss_hp, patterns=self.layout.boss_patterns)
+        self.add_enemy(self.boss)
+        self._place_barrels()
+        self.start_state = self.snapshot()
+
+    def restart(self):
+        if self.start_state is None:
+            self.setup()
+            return
+        count = len(self.players)
+        self.restore(self.start_state, self.tick)
+        while len(self.players) < count:
+            self.add_player()
+
+    def snapshot(self):
+        tick = self.tick
+        grid = self.grid
+        tanks = [tank for chunk in grid.chunk_tanks for tank in chunk]
+        order = {tank: i for i, tank in enumerate(tanks)}
+        tank_records = tuple(
+            (tank.cell, tank.center_x, tank.center_y, tank.target_x, tank.target_y, tank.is_moving,
+             tank.move_speed, tank.half_size, tank.logical_angle, tank.shoot_timer, tank.think_tick - tick,
+             tank.safe_until - tick, tank.slot, tank.start, tank.frags,
+             (tank.hp, tank.max_hp, tank.volley) if tank is self.boss else None)
+            for tank in tanks)
+        barrel_order = {barrel: i for i, barrel in enumerate(self.barrels)}
+        barrel_records = tuple(
+            (barrel.cell, barrel.center_x, barrel.center_y, barrel.target_x, barrel.target_y,
+             barrel.is_moving, barrel.hp)
+            for barrel in self.barrels)
+        bullets = self.bullets
+        slots = bullets.live()
+        return (self.layout.name, self.level, self.lives, self.score, tick, self.result,
+                self.wave, self.wave_size, self.wave_tick - tick, self.spawn_queue,
+                self.level_tick - tick, self.kills, self.barrels_destroyed, self.scheduler.cursor,
+                self.rng.getstate(), bytes(grid.walls), tank_records,
+                tuple(order[enemy] for enemy in self.enemies), barrel_records,
+                tuple(barrel_order[barrel] for barrel in grid.moving),
+                (slots.astype(np.int32).tobytes(), bullets.pos[slots].tobytes(),
+                 bullets.vel[slots].tobytes(), bullets.size[slots].tobytes(),
+                 bullets.is_enemy[slots].tobytes(), bullets.owner[slots].tobytes()))
+
+    def _build_state(self, state, tick=None):
+        (name, level, lives, score, saved_tick, result, wave, wave_size, wave_tick, spawn_queue,
+         level_tick, kills, barrels_destroyed, cursor, rng_state, walls, tank_records, enemy_order,
+         barrel_records, moving, bullet_state) = state
+        if tick is None:
+            tick = saved_tick
+        layout = self.layout
+        if layout is None or layout.name != name:
+            layout = load_level(name)
+        grid = TileGrid.from_level(layout)
+        if len(walls) != len(grid.walls):
+            raise ValueError(f"{name}: saved map has {len(walls)} cells, level has {len(grid.walls)}")
+        grid.walls[:] = walls
+        rng = random.Random()
+        rng.setstate(rng_state)
+        boss = None
+        tanks = []
+        for (cell, x, y, target_x, target_y, is_moving, speed, half_size, angle, shoot_timer,
+             think_tick, safe_until, slot, start, frags, boss_state) in tank_records:
+            if not grid.in_bounds(*cell):
+                raise ValueError(f"{name}: saved tank at {cell} is outside the map")
+            if boss_state is None:
+                tank = GridTank(*cell_center(*cell), speed, half_size)
+            else:
+                tank = Boss(*cell_center(*cell), hp=boss_state[1], patterns=layout.boss_patterns)
+                tank.hp = boss_state[0]
+                tank.volley = boss_state[2]
+                boss = tank
+            grid.add_tank(tank)
+            tank.center_x, tank.center_y = x, y
+            tank.target_x, tank.target_y = target_x, target_y
+            tank.is_moving = is_moving
+            tank.move_speed = speed
+            tank.logical_angle = angle
+            tank.shoot_timer = shoot_timer
+            tank.think_tick = tick + think_tick
+            tank.safe_until = tick + safe_until
+            tank.slot = slot
+            tank.start = start
+            tank.frags = frags
+            tanks.append(tank)
+        players = sorted((tank for tank in tanks if tank.slot >= 0), key=lambda tank: tank.slot)
+        if not players:
+            raise ValueError(f"{name}: saved state has no players")
+        enemies = [tanks[i] for i in enemy_order]
+        barrels = []
+        for cell, x, y, target_x, target_y, is_moving, hp in barrel_records:
+            if not grid.in_bounds(*cell):
+                raise ValueError(f"{name}: saved barrel at {cell} is outside the map")
+            barrel = Barrel(*cell_center(*cell))
+            grid.add_barrel(barrel)
+            barrel.center_x, barrel.center_y = x, y
+            barrel.target_x, barrel.target_y = target_x, target_y
+            barrel.is_moving = is_moving
+            barrel.hp = hp
+            if is_moving:
+                grid.reserve_barrel(barrel, *to_cell(target_x, target_y))
+            barrels.append(barrel)
+        grid.moving[:] = [barrels[i] for i in moving]
+        slots = np.frombuffer(bullet_state[0], dtype=np.int32)
+        if len(slots) and (slots.min() < 0 or slots.max() >= self.bullets.capacity):
+            raise ValueError(f"{name}: saved bullet slot is outside the pool")
+        bullets = (slots, np.frombuffer(bullet_state[1], dtype=np.float32).reshape(len(slots), 2),
+                   np.frombuffer(bullet_state[2], dtype=np.float32).reshape(len(slots), 2),
+                   np.frombuffer(bullet_state[3], dtype=np.float32).reshape(len(slots)),
+                   np.frombuffer(bullet_state[4], dtype=bool).reshape(len(slots)),
+                   np.frombuffer(bullet_state[5], dtype=np.int16).reshape(len(slots)))
+        return (layout, grid, level, lives, score, tick, result, wave, wave_size, tick + wave_tick,
+                spawn_queue, tick + level_tick, kills, barrels_destroyed, cursor, rng, boss, players,
+                enemies, barrels, bullets)
+
+    def check_state(self, state, tick=None):
+        try:
+            return self._build_state(state, tick)
+        except (TypeError, IndexError, KeyError) as error:
+            raise ValueError(f"saved state is malformed: {error}") from error
+
+    def restore(self, state, tick=None):
+        (self.layout, self.grid, self.level, self.lives, self.score, self.tick, self.result, self.wave,
+         self.wave_size, self.wave_tick, self.spawn_queue, self.level_tick, self.kills,
+         self.barrels_destroyed, cursor, rng, self.boss, self.players, self.enemies, self.barrels,
+         (slots, pos, vel, size, is_enemy, owner)) = self.check_state(state, tick)
+        self.scheduler = AIScheduler()
+        self.scheduler.cursor = cursor
+        self.rng.setstate(rng.getstate())
+        self.player = self.players[0]
+        bullets = self.bullets
+        bullets.clear()
+        bullets.pos[slots] = pos
+        bullets.vel[slots] = vel
+        bullets.size[slots] = size
+        bullets.is_enemy[slots] = is_enemy
+        bullets.owner[slots] = owner
+        bullets.alive[slots] = True
+        self.events.append(("level",))
+
+    def step(self, inputs=()):
+        self.events.clear()
+        if self.result is not None:
+            return self.events
+        self.tick += 1
+        profiler = self.profiler
+        for action in inputs:
+            self._apply_input(action)
+        profiler.mark("input")
+        grid = self.grid
+        bounds = self._active_bounds()
+        active = self._active_enemies(bounds)
+        if self.boss is not None:
+            self.boss.update_aim(self.player.center_x, self.player.center_y)
+        for player in self.players:
+            player.update()
+        for enemy in active:
+            enemy.update()
+        if grid.moving:
+            for barrel in grid.moving:
+                barrel.update()
+            grid.moving[:] = [barrel for barrel in grid.moving if barrel.is_moving]
+        self.bullets.update()
+        profiler.mark("movement")
+        player_cells = self._refresh_navigation(bounds)
+        idle = []
+        for enemy in active:
+            enemy.shoot_timer += TICK
+            if enemy is self.boss:
+                if enemy.shoot_timer > enemy.phase().interval:
+                    enemy.shoot(self.bullets)
+                    enemy.shoot_timer = 0
+            elif not enemy.is_moving:
+                idle.append(enemy)
+        for enemy in self.scheduler.select(idle, player_cells, grid.cols, self.tick):
+            enemy.think_tick = self.tick
+            self._think(enemy, player_cells)
+        profiler.count("deferred_ai", self.scheduler.deferred)
+        profiler.mark("ai")
+        self._resolve_bullets(active, bounds)
+        profiler.mark("bullets")
+        if self.level == ENDLESS_LEVEL:
+            if self.result is None:
+                self._endless_waves()
+        elif not self.enemies and self.result is None:
+            if self.level == SECRET_LEVEL:
+                pass
+            elif self.wave < len(self.layout.waves):
+                self._spawn_wave()
+            elif self.level < MAX_LEVELS:
+                self._level_stats(True)
+                self.level += 1
+                self.setup()
+            else:
+                self._finish("VICTORY!")
+        profiler.mark("rules")
+        return self.events
+
+    def _active_bounds(self):
+        grid = self.grid
+        if self.level == ENDLESS_LEVEL:
+            return grid.bounds()
+        bounds = grid.active_bounds(*self.player.cell)
+        for player in self.players[1:]:
+            other = grid.active_bounds(*player.cell)
+            bounds = (min(bounds[0], other[0]), min(bounds[1], other[1]),
+                      max(bounds[2], other[2]), max(bounds[3], other[3]))
+        return bounds
+
+    def _active_enemies(self, bounds):
+        if bounds == self.grid.bounds():
+            return self.enemies
+        return [tank for tank in self.grid.tanks_in(bounds) if tank.slot < 0]
+
+    def _refresh_navigation(self, bounds):
+        grid = self.grid
+        target = tuple(grid.index(*player.cell) for player in self.players)
+        if self.flow.grid is not grid:
+            self.flow = FlowField(grid)
+            self.sight = SightTable(grid)
+            grid.changes.clear()
+        elif grid.changes:
+            self.sight.update(grid.changes)
+        self.flow.update(target, grid.changes, bounds)
+        grid.changes.clear()
+        return target
+
+    def _think(self, enemy, player_cells):
+        cell = self.grid.index(*enemy.cell)
+        if enemy.shoot_timer > self.shoot_cooldown:
+            for player_cell in player_cells:
+                if self.sight.can_see(cell, player_cell):
+                    if cell != player_cell:
+                        enemy.logical_angle = direction_to(self.grid, cell, player_cell)[2]
+                    self.fire_bullet(enemy, is_enemy=True)
+                    enemy.shoot_timer = 0
+                    return
+        step = None
+        if self.rng.random() < AI_CHASE_CHANCE:
+            step = self.flow.next_step(cell)
+        enemy.start_move(*(step or self.rng.choice(AI_MOVES)))
+
+    def _apply_input(self, action):
+        player = self.player
+        if type(action) is tuple:
+            slot, action = action
+            player = self.players[slot]
+        if action in MOVES:
+            player.start_move(*MOVES[action])
+        elif action == FIRE:
+            self.fire_bullet(player)
+        elif action == RESTART:
+            self.restart()
+        elif action == SECRET:
+            self.setup_secret_level()
+
+    def _finish(self, result):
+        self.result = result
+        self._level_stats(result != "DEFEAT")
+        self.events.append(("game_over", result))
+
+    def _level_stats(self, cleared):
+        self.events.append(("level_stats", self.level, self.tick - self.level_tick, self.kills,
+                            self.barrels_destroyed, cleared))
+
+    def fire_bullet(self, owner, is_enemy=False):
+        visual_angle = owner.logical_angle
+        actual_angle = visual_angle
+        if visual_angle == 0:
+            actual_angle = 180
+        elif visual_angle == 180:
+            actual_angle = 0
+        radians_angle = math.radians(actual_angle)
+        self.bullets.spawn(owner.center_x + math.cos(radians_angle) * 25,
+                           owner.center_y + math.sin(radians_angle) * 25,
+                           math.cos(radians_angle) * BULLET_SPEED,
+                           math.sin(radians_angle) * BULLET_SPEED,
+                           6, is_enemy, owner.slot)
+        self.events.append(("shoot", owner.center_x, owner.center_y))
+
+    def _respawn(self, player):
+        start = cell_center(*player.start)
+        player.center_x, player.center_y = start
+        player.target_x, player.target_y = start
+        player.safe_until = self.tick + RESPAWN_GRACE
+        self.grid.move_tank(player, *player.start)
+
+    def _remove_barrel(self, barrel):
+        self.grid.remove_barrel(barrel)
+        self.barrels.remove(barrel)
+        self.events.append(("removed", barrel))
+
+    def _remove_enemy(self, enemy):
+        self.grid.remove_tank(enemy)
+        self.enemies.remove(enemy)
+        if enemy is self.boss:
+            self.boss = None
+        self.events.append(("removed", enemy))
+
+    def _resolve_bullets(self, active, bounds):
+        bullets = self.bullets
+        slots = bullets.live()
+        cells, inside = self.grid.cell_indices(bullets.pos[slots, 0], bullets.pos[slots, 1], bounds)
+        cells = np.where(inside, cells, 0)
+        blocked = ~inside | (self.grid.wall_mask()[cells] == 1)
+        bullets.kill(slots[blocked])
+        in_barrel = ~blocked & (self.grid.barrel_mask()[cells] == 1)
+        for slot, cell in zip(slots[in_barrel], cells[in_barrel]):
+            barrel = self.grid.barrels[cell]
+            if barrel is None:
+                continue
+            bullets.kill(slot)
+            if barrel.take_damage():
+                self.events.append(("explosion", barrel.center_x, barrel.center_y, "barrel"))
+                if self.rng.random() < self.life_drop_chance:
+                    self.lives += 1
+                    self.events.append(("life", barrel.center_x, barrel.center_y))
+                self._remove_barrel(barrel)
+                self.barrels_destroyed += 1
+                self.score += 50
+            else:
+                self.events.append(("barrel_hit", barrel))
+        slots = bullets.live()
+        pos = bullets.pos[slots]
+        half = bullets.size[slots] / 2
+        enemy_shots = bullets.is_enemy[slots]
+        for player in self.players:
+            hostile = enemy_shots
+            if self.mode == VERSUS:
+                hostile = bullets.owner[slots] != player.slot
+            player_hits = slots[hostile & bullets.alive[slots] &
+                                (np.abs(pos[:, 0] - player.center_x) < player.half_size + half) &
+                                (np.abs(pos[:, 1] - player.center_y) < player.half_size + half)]
+            if self.tick < player.safe_until:
+                bullets.kill(player_hits)
+                continue
+            for slot in player_hits:
+                bullets.kill(slot)
+                self.events.append(("explosion", player.center_x, player.center_y, "player_hit"))
+                if bullets.is_enemy[slot]:
+                    self.lives -= 1
+                    if self.lives <= 0:
+                        self._finish("DEFEAT")
+                        return
+                else:
+                    self.players[bullets.owner[slot]].frags += 1
+                if self.level != SECRET_LEVEL:
+                    self._respawn(player)
+                    break
+        shots = slots[~enemy_shots & bullets.alive[slots]]
+        if len(shots) == 0 or not active:
+            return
+        enemies = list(active)
+        ex = np.array([enemy.center_x for enemy in enemies])
+        ey = np.array([enemy.center_y for enemy in enemies])
+        extent = np.array([enemy.half_size for enemy in enemies])
+        pos = bullets.pos[shots]
+        half = bullets.size[shots, None] / 2
+        hits = ((np.abs(pos[:, 0, None] - ex) < extent + half) &
+                (np.abs(pos[:, 1, None] - ey) < extent + half))
+        for row in np.flatnonzero(hits.any(axis=1)):
+            if not hits[row].any():
+                continue
+            bullets.kill(shots[row])
+            column = int(np.argmax(hits[row]))
+            target = enemies[column]
+            if target is self.boss:
+                if target.take_damage():
+                    self.events.append(("explosion", target.center_x, target.center_y, "boss"))
+                    self._remove_enemy(target)
+                    self.kills += 1
+                    self.score += 1000
+                    self._finish("BOSS DEFEATED!")
+                    return
+                self.events.append(("explosion", target.center_x, target.center_y, "boss_hit"))
+            else:
+                self.events.append(("explosion", target.center_x, target.center_y, "enemy"))
+                self._remove_enemy(target)
+                self.kills += 1
+                self.score += 100
+                hits[:, column] = False
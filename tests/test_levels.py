@@ -0,0 +1,20 @@
+import pytest
+
+from levels import parse_level
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"map": []},
+    {"map": "P.."},
+    {"map": ["", ""]},
+    {"map": ["P..", 42]},
+    {"map": ["P..", "...."]},
+    ["P.."],
+])
+def test_malformed_map_is_rejected(data):
+    with pytest.raises(ValueError):
+        parse_level("broken", data)
+
+def test_minimal_map_is_parsed():
+    level = parse_level("tiny", {"map": ["#P#", "###"]})
+    assert (level.cols, level.rows) == (3, 2)
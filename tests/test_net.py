@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from net import BULLET, SNAPSHOT_HEADER, ClientWorld, GameServer
+from patterns import MAX_SPEED, compile_patterns
+from simulation import VERSUS
+
+FAST_PHASES = [{"attacks": [
+    {"type": "ring", "count": 16, "speed": MAX_SPEED},
+    {"type": "burst", "count": 8, "speed": 12, "speed_step": 4},
+]}]
+
+def test_fast_pattern_round_trips_through_snapshot_encoder():
+    server = GameServer(seed=1)
+    sim = server.sim
+    for phase in compile_patterns(FAST_PHASES):
+        for attack in phase.attacks:
+            attack.emit(sim.bullets, 400, 300, 0.5, 0)
+    bullets = server._bullets()
+    count = len(bullets) // BULLET.size
+    assert count == len(sim.bullets) == 24
+    header = SNAPSHOT_HEADER.pack(sim.tick, 0, time.monotonic(), sim.level, sim.lives, sim.score,
+                                  0, 0, 0, count, 0)
+    world = ClientWorld(None)
+    world._apply_snapshot(header + bullets)
+    sent = sim.bullets.vel[sim.bullets.live()]
+    received = world.bullets.vel[world.bullets.live()]
+    assert received == pytest.approx(sent, abs=0.051)
+
+def test_versus_frags_and_angles_reach_client_tanks():
+    server = GameServer(seed=1, mode=VERSUS)
+    sim = server.sim
+    sim.add_player()
+    sim.players[0].frags = 3
+    sim.players[1].frags = 5
+    sim.players[0].logical_angle = 270
+    records = server._records()
+    header = SNAPSHOT_HEADER.pack(sim.tick, 0, time.monotonic(), sim.level, sim.lives, sim.score,
+                                  0, len(records), 0, 0, 0)
+    world = ClientWorld(None)
+    world.slot = 1
+    world._load_level(sim.level, sim.layout.name)
+    world._apply_snapshot(header + b"".join(records.values()))
+    assert {player.slot: player.frags for player in world.players} == {0: 3, 1: 5}
+    assert [player.logical_angle for player in world.players if player.slot == 0] == [270]
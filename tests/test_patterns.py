@@ -0,0 +1,21 @@
+import pytest
+
+from patterns import MAX_SPEED, compile_patterns
+
+@pytest.mark.parametrize("attack", [
+    {"type": "fan", "speed": MAX_SPEED + 1},
+    {"type": "burst", "count": 10, "speed": 20, "speed_step": 5},
+    {"type": "ring", "size": 1000},
+])
+def test_pattern_beyond_wire_limits_is_rejected(attack):
+    with pytest.raises(ValueError):
+        compile_patterns([{"attacks": [attack]}])
+
+@pytest.mark.parametrize("aimed", ["false", 0, 1, None])
+def test_non_boolean_aimed_is_rejected(aimed):
+    with pytest.raises(ValueError):
+        compile_patterns([{"attacks": [{"type": "fan", "aimed": aimed}]}])
+
+def test_aimed_flag_is_kept():
+    phase, = compile_patterns([{"attacks": [{"type": "ring", "aimed": True}, {"type": "fan", "aimed": False}]}])
+    assert [attack.aimed for attack in phase.attacks] == [True, False]
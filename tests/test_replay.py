@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import replay
+import simulation
+from replay import HEADER, REPLAY_MAGIC, REPLAY_VERSION, Replay, play_headless
+from simulation import Simulation
+
+MOVES = (simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT, simulation.FIRE, replay.ZOOM)
+
+def record_run(seed, ticks):
+    rng = random.Random(seed)
+    sim = Simulation(seed)
+    sim.setup()
+    recording = Replay(seed)
+    while sim.tick < ticks and sim.result is None:
+        actions = [rng.choice(MOVES)] if rng.random() < 0.2 else []
+        for action in actions:
+            recording.record(sim.tick + 1, action)
+        sim.step([action for action in actions if action != replay.ZOOM])
+    recording.finish(sim.tick)
+    return sim, recording
+
+def test_decoded_replay_reproduces_the_recorded_run():
+    sim, recording = record_run(7, 1200)
+    decoded = Replay.decode(recording.encode())
+    assert decoded.events == recording.events
+    played = play_headless(decoded)
+    assert (played.tick, played.level, played.score, played.lives, played.result) == \
+        (sim.tick, sim.level, sim.score, sim.lives, sim.result)
+    assert played.snapshot() == sim.snapshot()
+
+@pytest.mark.parametrize("data", [
+    b"TNKR",
+    HEADER.pack(b"XXXX", REPLAY_VERSION, 1, 1, 0, 0),
+    HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION + 1, 1, 1, 0, 0),
+    HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, 1, 1, 10, 3) + b"garbage",
+])
+def test_bad_replay_data_is_rejected(data):
+    with pytest.raises(ValueError):
+        Replay.decode(data)
+
+def test_truncated_replay_body_is_rejected():
+    _, recording = record_run(3, 600)
+    data = recording.encode()
+    with pytest.raises(ValueError):
+        Replay.decode(data[:len(data) - 4])
+
+def test_cli_reports_missing_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["replay.py", str(tmp_path / "missing.tnkr")])
+    assert replay.main() == 1
+    assert "cannot load replay" in capsys.readouterr().err
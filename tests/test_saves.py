@@ -0,0 +1,68 @@
+import pytest
+
+from saves import HEADER, SAVE_MAGIC, SAVE_VERSION, SaveGame
+from simulation import Simulation
+
+def run(sim, ticks):
+    for _ in range(ticks):
+        sim.step()
+
+def started(seed=5, ticks=300):
+    sim = Simulation(seed)
+    sim.setup()
+    sim.lives = 1000
+    run(sim, ticks)
+    return sim
+
+def test_restored_snapshot_replays_identically():
+    sim = started()
+    state = sim.snapshot()
+    run(sim, 600)
+    expected = sim.snapshot()
+    sim.restore(state)
+    run(sim, 600)
+    assert sim.snapshot() == expected
+
+def test_save_round_trip_restores_the_game():
+    sim = started()
+    data = SaveGame.capture(sim).encode()
+    expected = sim.snapshot()
+    run(sim, 100)
+    loaded = SaveGame.decode(data)
+    other = Simulation(99)
+    other.setup()
+    loaded.apply(other)
+    assert other.snapshot() == expected
+    assert other.start_state == sim.start_state
+
+@pytest.mark.parametrize("data", [
+    b"TNKS",
+    HEADER.pack(b"XXXX", SAVE_VERSION, 1, 0, 0),
+    HEADER.pack(SAVE_MAGIC, SAVE_VERSION + 1, 1, 0, 0),
+    HEADER.pack(SAVE_MAGIC, SAVE_VERSION, 1, 0, 0) + b"garbage",
+])
+def test_bad_save_data_is_rejected(data):
+    with pytest.raises(ValueError):
+        SaveGame.decode(data)
+
+def replace(state, index, value):
+    return state[:index] + (value,) + state[index + 1:]
+
+@pytest.mark.parametrize("corrupt, error", [
+    (lambda state: state[:-1], ValueError),
+    (lambda state: replace(state, 0, "no_such_level"), FileNotFoundError),
+    (lambda state: replace(state, 16, ((((999, 999),) + state[16][0][1:]),) + state[16][1:]), ValueError),
+    (lambda state: replace(state, 17, state[17] + (len(state[16]),)), ValueError),
+    (lambda state: replace(state, 20, (b"\xff\xff\xff\x7f",) + state[20][1:]), ValueError),
+])
+def test_broken_state_leaves_the_game_untouched(corrupt, error):
+    sim = started()
+    before = sim.snapshot()
+    with pytest.raises(error):
+        sim.restore(corrupt(before))
+    assert sim.snapshot() == before
+    with pytest.raises(error):
+        SaveGame(corrupt(before), sim.start_state, sim.level, sim.tick, sim.score).apply(sim)
+    with pytest.raises(error):
+        SaveGame(before, corrupt(sim.start_state), sim.level, sim.tick, sim.score).apply(sim)
+    assert sim.snapshot() == before
@@ -0,0 +1,29 @@
+from simulation import RESPAWN_GRACE, Simulation
+
+def test_player_loses_at_most_one_life_per_tick():
+    for seed in range(20):
+        sim = Simulation(seed)
+        sim.setup()
+        lives = sim.lives
+        while sim.tick < 3000 and sim.result is None:
+            sim.step()
+            assert lives - sim.lives <= 1, f"seed {seed} tick {sim.tick}"
+            lives = sim.lives
+
+def test_respawned_player_is_safe_for_the_grace_period():
+    gaps = []
+    for seed in range(10):
+        sim = Simulation(seed)
+        sim.setup()
+        sim.lives = 1000
+        lives = sim.lives
+        last_hit = None
+        while sim.tick < 3000 and sim.result is None:
+            sim.step()
+            if sim.lives < lives:
+                if last_hit is not None:
+                    gaps.append(sim.tick - last_hit)
+                last_hit = sim.tick
+            lives = sim.lives
+    assert gaps
+    assert min(gaps) >= RESPAWN_GRACE